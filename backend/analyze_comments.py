@@ -1,32 +1,226 @@
-from flask import Blueprint, request, jsonify
+import json
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from flask import Blueprint, Response, current_app, request, jsonify
 from models.sentiment_model import MultimodalSentimentAnalyzer
-analyzer = MultimodalSentimentAnalyzer()
+from utils.reddit_scraper import iter_post_and_comments
+from utils.result_sink import record_results
+from utils.sentiment_store import item_id
+analyzer = MultimodalSentimentAnalyzer(precision=os.environ.get('INFERENCE_PRECISION', 'fp32'))
+# Number of comments per padded forward pass
+COMMENT_BATCH_SIZE = int(os.environ.get('COMMENT_BATCH_SIZE', 32))
+# "Load more" stubs expanded by /api/posts/<subreddit>/<post_id>/analyze unless the request says otherwise
+MORE_COMMENTS_LIMIT = int(os.environ.get('MORE_COMMENTS_LIMIT', 8))
 
 analyze_comments_bp = Blueprint('analyze_comments', __name__)
 
+
+class SentimentAggregate:
+    """Running majority sentiment and average distribution over analysis results."""
+
+    def __init__(self):
+        self.distribution_sum = {'Negative': 0, 'Neutral': 0, 'Positive': 0}
+        self.sentiments = Counter()
+        self.count = 0
+
+    def add(self, results):
+        for r in results:
+            if 'sentiment' in r:
+                self.sentiments[r['sentiment']] += 1
+            if 'distribution' in r:
+                for k in self.distribution_sum:
+                    self.distribution_sum[k] += r['distribution'].get(k, 0)
+                self.count += 1
+
+    def summary(self):
+        count = self.count
+        return {
+            'avg_distribution': {k: (self.distribution_sum[k] / count if count else 0) for k in self.distribution_sum},
+            'majority_sentiment': self.sentiments.most_common(1)[0][0] if self.sentiments else 'Neutral',
+            'count': count
+        }
+
+
+def _parse_comments_request(data):
+    """Validate a comments request body, returning (texts, comments, batch_size, error_response).
+
+    Each comment is a bare string or an object with `text` and optionally `id`,
+    `author`, `subreddit`, `parent_id` and `timestamp`; strings become {'text': ...}.
+    """
+    comments = data.get('comments', [])
+    if not comments or not isinstance(comments, list):
+        return None, None, None, (jsonify({'error': 'No comments provided'}), 400)
+    comments = [{'text': comment} if isinstance(comment, str) else comment for comment in comments]
+    if not all(isinstance(comment, dict) and isinstance(comment.get('text'), str) for comment in comments):
+        return None, None, None, (jsonify({'error': 'Each comment must be a string or an object with a text'}), 400)
+    batch_size = data.get('batch_size', COMMENT_BATCH_SIZE)
+    if not isinstance(batch_size, int) or batch_size < 1:
+        return None, None, None, (jsonify({'error': 'batch_size must be a positive integer'}), 400)
+    return [comment['text'] for comment in comments], comments, batch_size, None
+
+
+def _record_comments(comments, results):
+    # Only comments sent with an id can be stored and counted once in trending
+    pairs = [(comment, result) for comment, result in zip(comments, results) if item_id(comment)]
+    if pairs:
+        record_results([comment for comment, _ in pairs], [result for _, result in pairs], 'comment', analyzer.model_id)
+
+
 @analyze_comments_bp.route('/api/analyze/comments', methods=['POST'])
 def analyze_comments():
-    comments = request.json.get('comments', [])
-    if not comments or not isinstance(comments, list):
-        return jsonify({'error': 'No comments provided'}), 400
+    texts, comments, batch_size, error = _parse_comments_request(request.json)
+    if error:
+        return error
 
-    results = [analyzer.analyze(text=comment, image=None) for comment in comments]
+    results = analyzer.analyze_batch(texts, batch_size=batch_size)
+    _record_comments(comments, results)
     # Aggregate: majority sentiment and average distribution
-    sentiments = [r['sentiment'] for r in results if 'sentiment' in r]
-    distribution_sum = {'Negative': 0, 'Neutral': 0, 'Positive': 0}
-    count = 0
-    for r in results:
-        if 'distribution' in r:
-            for k in distribution_sum:
-                distribution_sum[k] += r['distribution'].get(k, 0)
-            count += 1
-    avg_distribution = {k: (distribution_sum[k] / count if count else 0) for k in distribution_sum}
-    # Majority sentiment
-    from collections import Counter
-    sentiment_majority = Counter(sentiments).most_common(1)[0][0] if sentiments else 'Neutral'
-    return jsonify({
-        'results': results,
-        'avg_distribution': avg_distribution,
-        'majority_sentiment': sentiment_majority,
-        'count': count
-    })
+    aggregate = SentimentAggregate()
+    aggregate.add(results)
+    return jsonify({'results': results, **aggregate.summary()})
+
+
+@analyze_comments_bp.route('/api/analyze/comments/stream', methods=['POST'])
+def analyze_comments_stream():
+    """Stream per-batch results as NDJSON (default) or Server-Sent Events.
+
+    Emits {"type": "results", "offset", "results"} after every mini-batch,
+    {"type": "aggregate", ...} every `aggregate_every` batches and a final
+    {"type": "done", ...} with the same aggregates as /api/analyze/comments.
+    """
+    data = request.json
+    texts, comments, batch_size, error = _parse_comments_request(data)
+    if error:
+        return error
+    aggregate_every = data.get('aggregate_every', 5)
+    if not isinstance(aggregate_every, int) or aggregate_every < 1:
+        return jsonify({'error': 'aggregate_every must be a positive integer'}), 400
+    sse = data.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+
+    def encode(event):
+        payload = json.dumps(event)
+        return f"event: {event['type']}\ndata: {payload}\n\n" if sse else payload + '\n'
+
+    def generate():
+        aggregate = SentimentAggregate()
+        try:
+            for batch_number, offset in enumerate(range(0, len(texts), batch_size), start=1):
+                results = analyzer.analyze_batch(texts[offset:offset + batch_size], batch_size=batch_size)
+                _record_comments(comments[offset:offset + batch_size], results)
+                aggregate.add(results)
+                yield encode({'type': 'results', 'offset': offset, 'results': results})
+                if batch_number % aggregate_every == 0:
+                    yield encode({'type': 'aggregate', **aggregate.summary()})
+        except Exception as e:
+            yield encode({'type': 'error', 'error': f"Analysis error: {str(e)}"})
+            return
+        yield encode({'type': 'done', **aggregate.summary()})
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='text/event-stream' if sse else 'application/x-ndjson', headers=headers)
+
+
+@analyze_comments_bp.route('/api/posts/<subreddit>/<post_id>/analyze', methods=['GET'])
+def analyze_post_and_comments(subreddit, post_id):
+    """Fetch a post and its comments and analyze them in one pipelined request.
+
+    A producer thread fetches the post and comment chunks, expanding up to
+    `more_limit` "load more" stubs one at a time, into a bounded queue while
+    this thread batches comments into the analyzer, and the post's first
+    image is downloaded concurrently for the post's own sentiment. The post is
+    scored by the app's `analyze_post` extension, i.e. the same model, cache
+    and result as /api/analyze. A post from another subreddit is a 404.
+    """
+    batch_size = request.args.get('batch_size', default=COMMENT_BATCH_SIZE, type=int)
+    more_limit = request.args.get('more_limit', default=MORE_COMMENTS_LIMIT, type=int)
+    if batch_size < 1:
+        return jsonify({'error': 'batch_size must be a positive integer'}), 400
+    if more_limit < 0:
+        return jsonify({'error': 'more_limit must not be negative'}), 400
+
+    chunks = queue.Queue(maxsize=8)
+    stopped = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has bailed out, so the producer never blocks forever
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iter_post_and_comments(post_id, chunk_size=batch_size, more_limit=more_limit):
+                if not put(item):
+                    return
+            put(('end', None))
+        except Exception as e:
+            put(('error', e))
+
+    threading.Thread(target=produce, name=f'fetch-{post_id}', daemon=True).start()
+    image_pool = ThreadPoolExecutor(max_workers=1)
+    post = None
+    image_future = None
+    comments = []
+    results = []
+    aggregate = SentimentAggregate()
+    pending = []
+
+    def flush(texts):
+        batch_results = analyzer.analyze_batch(texts, batch_size=batch_size)
+        aggregate.add(batch_results)
+        results.extend(batch_results)
+
+    try:
+        while True:
+            kind, payload = chunks.get()
+            if kind == 'error':
+                logging.error(f"Failed to fetch post/comments: {payload}", exc_info=payload)
+                return jsonify({'error': f'Failed to fetch post/comments: {str(payload)}'}), 500
+            if kind == 'post':
+                post = payload
+                if post['subreddit'].lower() != subreddit.lower():
+                    return jsonify({'error': f'Post {post_id} not found in r/{subreddit}'}), 404
+                if post['images']:
+                    image_future = image_pool.submit(_fetch_image, post['images'][0])
+            elif kind == 'comments':
+                comments.extend(payload)
+                pending.extend(comment['text'] for comment in payload)
+                while len(pending) >= batch_size:
+                    flush(pending[:batch_size])
+                    pending = pending[batch_size:]
+            else:
+                break
+        if pending:
+            flush(pending)
+        image_bytes = image_future.result() if image_future else None
+        post['sentiment'] = current_app.extensions['analyze_post'](post, image_bytes)
+        record_results(
+            [{**comment, 'subreddit': post['subreddit'], 'parent_id': post['post_id']} for comment in comments],
+            results, 'comment', analyzer.model_id
+        )
+    except Exception as e:
+        logging.exception(f"Failed to analyze post/comments: {e}")
+        return jsonify({'error': f'Analysis error: {str(e)}'}), 500
+    finally:
+        stopped.set()
+        image_pool.shutdown(wait=False)
+    return jsonify({'post': post, 'comments': comments, 'results': results, **aggregate.summary()})
+
+
+def _fetch_image(url):
+    try:
+        resp = requests.get(url, timeout=10)
+        resp.raise_for_status()
+        return resp.content
+    except Exception as e:
+        logging.warning(f"Failed to fetch post image {url}: {e}")
+        return None
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import json
@@ -8,86 +8,392 @@ from PIL import Image
 import torch
 import re
 import logging
+import functools
+import time
 import requests
 from utils.reddit_scraper import get_posts_from_subreddit, get_post_and_comments, get_reddit_client
 from models.advanced_multimodal_sentiment import AdvancedMultimodalSentimentAnalyzer
+from models.model_registry import registry
+from utils.inference_batcher import InferenceBatcher
+from utils.result_cache import SentimentResultCache
+from utils.fanout import FanOutExecutor
+from utils.listing_cache import avatar_cache, listing_cache
+from utils.reddit_client_pool import pool as reddit_pool
+from utils.post_index import post_index
+from utils.author_index import author_index
+from utils.sentiment_store import sentiment_store
+from utils.result_sink import backfill_trending, record_results
+from utils.trending import trending
+from utils.ingestion import IngestionScheduler, activity, parse_sources
+from utils.metrics import metrics
+from utils.request_profiler import request_profiler
+from models.stages import stage
+
+# Configure logging; DEBUG logs every probability vector, so only enable it when diagnosing
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 app = Flask(__name__)
-# Initialize the sentiment analyzer
+# Initialize the sentiment analyzer; models load lazily per modality
 app.logger.info('Initializing sentiment analyzer...')
-analyzer = AdvancedMultimodalSentimentAnalyzer()
+analyzer = AdvancedMultimodalSentimentAnalyzer(
+    precision=os.environ.get('INFERENCE_PRECISION', 'fp32'),
+    backend=os.environ.get('INFERENCE_BACKEND', 'eager'),
+    export_dir=os.environ.get('EXPORT_DIR') or None,
+)
 app.logger.info('Sentiment analyzer initialized successfully')
+# Modalities /api/analyze serves; readiness waits until all of them are loaded
+SERVED_MODALITIES = [m.strip() for m in os.environ.get('SERVED_MODALITIES', 'text,image').split(',') if m.strip()]
+# Modalities to load in the background at startup, e.g. "text,image" (empty disables warm-up)
+WARMUP_MODALITIES = [m.strip() for m in os.environ.get('WARMUP_MODALITIES', 'text').split(',') if m.strip()]
+if WARMUP_MODALITIES:
+    analyzer.warm_up(WARMUP_MODALITIES, background=True)
+# Rebuild rolling trending windows from stored results
+backfill_trending(background=True)
+# Micro-batch concurrent /api/analyze requests into shared forward passes
+batcher = InferenceBatcher(
+    analyzer,
+    max_batch_size=int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 16)),
+    max_wait_ms=float(os.environ.get('INFERENCE_MAX_WAIT_MS', 5)),
+)
+# Cache results by content so repeated texts/images skip inference entirely
+result_cache = SentimentResultCache(
+    max_bytes=int(float(os.environ.get('RESULT_CACHE_MAX_MB', 64)) * 1024 * 1024),
+    ttl=float(os.environ.get('RESULT_CACHE_TTL', 3600)),
+    db_path=os.environ.get('RESULT_CACHE_DB') or None,
+)
+# Concurrent fan-out over upstream sources for multi-source endpoints
+fanout = FanOutExecutor(max_workers=int(os.environ.get('FANOUT_MAX_WORKERS', 16)))
+FANOUT_CONCURRENCY = int(os.environ.get('FANOUT_CONCURRENCY', 5))
+FANOUT_DEADLINE = float(os.environ.get('FANOUT_DEADLINE', 8))
+# Newest posts pulled per subreddit when the search index needs topping up
+SEARCH_TOPUP_LIMIT = int(os.environ.get('SEARCH_TOPUP_LIMIT', 100))
+POPULAR_SUBREDDITS = ['all', 'news', 'worldnews', 'technology', 'funny', 'AskReddit', 'pics', 'gaming', 'science', 'movies']
 # Enable CORS for all routes and origins
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Import and register analyze_comments blueprint
 try:
-    from analyze_comments import analyze_comments_bp
+    from analyze_comments import analyze_comments_bp, analyzer as comment_analyzer
     app.register_blueprint(analyze_comments_bp)
 except ImportError:
+    comment_analyzer = None
     logging.warning("analyze_comments module not found, skipping blueprint registration")
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Pre-score hot subreddits/hashtags in the background, e.g. INGEST_SUBREDDITS="news:2,worldnews" (name:priority)
+ingestion = IngestionScheduler(
+    analyzer,
+    result_cache,
+    comment_analyzer=comment_analyzer,
+    subreddits=parse_sources(os.environ.get('INGEST_SUBREDDITS', '')),
+    hashtags=parse_sources(os.environ.get('INGEST_HASHTAGS', '')),
+    interval=float(os.environ.get('INGEST_INTERVAL', 300)),
+    jitter=float(os.environ.get('INGEST_JITTER', 0.2)),
+    post_limit=int(os.environ.get('INGEST_POST_LIMIT', 25)),
+    comment_posts=int(os.environ.get('INGEST_COMMENT_POSTS', 3)),
+    batch_size=int(os.environ.get('INGEST_BATCH_SIZE', 8)),
+)
+ingestion.start()
+
+@app.before_request
+def track_interactive_request():
+    # Background ingestion waits while any user request is in flight
+    if not request.path.startswith('/api/health'):
+        request.environ['ingestion.active'] = True
+        activity.enter()
+
+@app.after_request
+def track_streamed_body(response):
+    # Teardown runs before a streamed body is generated; keep ingestion held back until it has been sent
+    if response.is_streamed and request.environ.pop('ingestion.active', False):
+        response.call_on_close(activity.exit)
+    return response
+
+@app.teardown_request
+def untrack_interactive_request(exc=None):
+    if request.environ.pop('ingestion.active', False):
+        activity.exit()
+
+@app.before_request
+def start_request_timer():
+    request.environ['metrics.start'] = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    start = request.environ.get('metrics.start')
+    if start is not None:
+        # Route templates keep label cardinality bounded
+        labels = {'endpoint': request.url_rule.rule if request.url_rule else 'unmatched',
+                  'method': request.method, 'status': response.status_code}
+        observe = lambda: metrics.observe('http_request_duration_seconds', time.perf_counter() - start, **labels)
+        # A streamed body is generated after this hook returns; time it up to when the server closes it
+        if response.is_streamed:
+            response.call_on_close(observe)
+        else:
+            observe()
+    return response
+
+def _model_load_seconds():
+    values = {(('analyzer', 'advanced'), ('modality', name)): seconds for name, seconds in analyzer.loader.load_seconds.items()}
+    if comment_analyzer is not None:
+        for name, seconds in comment_analyzer.loader.load_seconds.items():
+            values[(('analyzer', 'comments'), ('modality', name))] = seconds
+    return values
+
+metrics.gauge('sentiment_batcher_queue_depth', 'Requests waiting for the inference batcher', lambda: batcher.queue_depth)
+metrics.gauge('sentiment_result_cache_hit_rate', 'Result cache hit rate since start', lambda: result_cache.stats()['hit_rate'])
+metrics.counter('sentiment_result_cache_lookups_total', 'Result cache lookups by outcome',
+                lambda: {(('outcome', k),): v for k, v in result_cache.stats().items() if k in ('hits', 'disk_hits', 'misses')})
+metrics.counter('listing_cache_lookups_total', 'Listing cache lookups by outcome',
+                lambda: {(('outcome', k),): v for k, v in listing_cache.stats().items() if k in ('hits', 'stale_hits', 'misses')})
+metrics.gauge('sentiment_model_load_seconds', 'Time taken to load each model', _model_load_seconds)
+metrics.gauge('http_requests_active', 'Interactive requests in flight', lambda: activity.active)
+metrics.gauge('sentiment_store_queued_batches', 'Result batches waiting to be written', lambda: sentiment_store.stats()['queued_batches'])
+metrics.gauge('reddit_ratelimit_remaining', 'Reddit rate-limit budget left in the window', lambda: reddit_pool.budget.remaining)
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiling', methods=['GET', 'POST'])
+def profiling():
+    # POST {"enabled": true, "sample_rate": 0.01} to sample requests without a restart
+    if not request_profiler.authorized(request.headers):
+        return jsonify({'error': 'missing or invalid profiling token (PROFILE_TOKEN)'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            request_profiler.configure(enabled=data.get('enabled'), sample_rate=data.get('sample_rate'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'sample_rate must be a number'}), 400
+    return jsonify(request_profiler.status())
+
+@app.route('/api/profiling/traces/<filename>', methods=['GET'])
+def profiling_trace(filename):
+    if not request_profiler.authorized(request.headers):
+        return jsonify({'error': 'missing or invalid profiling token (PROFILE_TOKEN)'}), 403
+    path = request_profiler.trace_path(filename)
+    if path is None:
+        return jsonify({'error': 'trace not found'}), 404
+    return send_file(os.path.abspath(path), mimetype='application/json', as_attachment=True)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "ok"})
+    # Liveness: the process is up and serving, whether or not models are loaded
+    return jsonify({"status": "ok", "models": analyzer.loader.status()})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    # Ready once every analyzer has loaded each modality it serves; the probe starts any load not yet
+    # under way, so the app still becomes ready with warm-up disabled or covering fewer modalities
+    ready = analyzer.loader.start_loading(SERVED_MODALITIES)
+    body = {"models": analyzer.loader.status()}
+    if comment_analyzer is not None:
+        # The comment endpoints are text-only
+        ready = comment_analyzer.loader.start_loading(['text']) and ready
+        body["comment_models"] = comment_analyzer.loader.status()
+    return jsonify({"ready": ready, **body}), (200 if ready else 503)
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_sentiment():
+    if not request_profiler.should_profile(request.headers):
+        return run_analysis()
+    with request_profiler.capture('analyze_sentiment') as summary:
+        response = app.make_response(run_analysis(profiled=summary is not None))
+    if summary and summary.get('trace'):
+        response.headers['X-Profile-Trace'] = summary['trace']
+    return response
+
+def run_analysis(profiled=False):
     data = request.json
     text = data.get('text', '')
     # Handle image data (base64 encoded or URL)
     image = None
+    image_bytes = None
     image_input = data.get('image')
     if image_input:
         try:
             if isinstance(image_input, str):
                 if image_input.startswith('data:image'):
                     # Split header if present and decode base64
-                    image_data = image_input.split(',')[1] if ',' in image_input else image_input
-                    image_bytes = base64.b64decode(image_data)
+                    with stage('base64_decode'):
+                        image_data = image_input.split(',')[1] if ',' in image_input else image_input
+                        image_bytes = base64.b64decode(image_data)
                 else:
                     # Assume image_input is a URL
-                    resp = requests.get(image_input, timeout=10)
-                    resp.raise_for_status()
-                    image_bytes = resp.content
-                image = Image.open(BytesIO(image_bytes)).convert('RGB')
+                    with stage('image_fetch'):
+                        resp = requests.get(image_input, timeout=10)
+                        resp.raise_for_status()
+                        image_bytes = resp.content
             else:
                 logging.warning("Unsupported image input type: %s", type(image_input))
+        except Exception as e:
+            logging.exception("Failed to fetch image for analysis: %s", e)
+            image_bytes = None
+    # Optional metadata of the analyzed post/tweet, e.g. {"id", "kind", "subreddit", "author", "timestamp"}
+    item = data.get('item') if isinstance(data.get('item'), dict) else None
+    cache_key = result_cache.make_key(text, image_bytes, analyzer.model_id)
+    # A profiled request always runs the models, otherwise the trace would only show a cache lookup
+    cached = None if profiled else result_cache.get(cache_key)
+    if cached is not None:
+        if item:
+            record_item(item, cached)
+        return jsonify(cached)
+    if image_bytes:
+        try:
+            with stage('pil_decode'):
+                image = Image.open(BytesIO(image_bytes)).convert('RGB')
         except Exception as e:
             logging.exception("Failed to decode image for analysis: %s", e)
             image = None
     # Analyze sentiment
     try:
-        result = analyzer.analyze(text, image)
-        logging.debug(f"Sentiment analysis result: {result}")
-        return jsonify(result)
+        if profiled:
+            # Run on this thread so the profiler sees the forward passes
+            result = analyzer.analyze_batch([text], [image], batch_size=1)[0]
+        else:
+            result = batcher.analyze(text, image)
+        logging.debug("Sentiment analysis result: %s", result)
+        result_cache.set(cache_key, result)
+        if item:
+            record_item(item, result)
+        with stage('json_serialize'):
+            return jsonify(result)
     except Exception as e:
         logging.exception("Analysis error: %s", e)
         return jsonify({"error": f"Analysis error: {str(e)}"}), 500
 
+def record_item(item, result):
+    kind = item.get('kind', 'post')
+    source = item.get('source', 'reddit')
+    record_results([item], [result], kind, analyzer.model_id, source=source)
+    if kind == 'post' and source == 'reddit':
+        post_index.set_sentiment(item.get('id') or item.get('post_id'), result.get('sentiment'))
+
+def analyze_post(post, image_bytes=None):
+    """Score a fetched Reddit post exactly as /api/analyze does for the frontend, sharing its cache and batcher."""
+    text = post['text'] if post.get('text') and post['text'].strip() else (post.get('title') or '')
+    cache_key = result_cache.make_key(text, image_bytes, analyzer.model_id)
+    result = result_cache.get(cache_key)
+    if result is None:
+        image = None
+        if image_bytes:
+            try:
+                with stage('pil_decode'):
+                    image = Image.open(BytesIO(image_bytes)).convert('RGB')
+            except Exception as e:
+                logging.warning("Failed to decode image of post %s: %s", post.get('post_id'), e)
+        result = batcher.analyze(text, image)
+        result_cache.set(cache_key, result)
+    record_item({**post, 'kind': 'post', 'source': 'reddit'}, result)
+    return result
+
+# Used by the comments blueprint, which cannot import this module
+app.extensions['analyze_post'] = analyze_post
+
+@app.route('/api/sentiment/history', methods=['GET'])
+def sentiment_history():
+    # e.g. /api/sentiment/history?dimension=subreddit&value=news&bucket=3600&since=1700000000
+    dimension = request.args.get('dimension', 'subreddit')
+    value = request.args.get('value', '').strip()
+    if not value:
+        return jsonify({'error': 'value required'}), 400
+    try:
+        history = sentiment_store.sentiment_over_time(
+            dimension, value,
+            bucket_seconds=request.args.get('bucket', default=3600, type=int),
+            since=request.args.get('since', type=int),
+            until=request.args.get('until', type=int),
+            kind=request.args.get('kind') or None,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'dimension': dimension, 'value': value, 'history': history})
+
+@app.route('/api/sentiment/top', methods=['GET'])
+def sentiment_top():
+    dimension = request.args.get('dimension', 'subreddit')
+    try:
+        top = sentiment_store.top(
+            dimension,
+            since=request.args.get('since', type=int),
+            until=request.args.get('until', type=int),
+            kind=request.args.get('kind') or None,
+            limit=request.args.get('limit', default=10, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'dimension': dimension, 'top': top})
+
+@app.route('/api/trending', methods=['GET'])
+def get_trending():
+    # e.g. /api/trending?dimension=subreddit&window=24h&sort=volume, or &key=news for every window of one key
+    dimension = request.args.get('dimension', 'subreddit')
+    key = request.args.get('key', '').strip()
+    if key:
+        windows = trending.series(dimension, key)
+        if windows is None:
+            return jsonify({'error': f'No results for {dimension} {key}'}), 404
+        return jsonify({'dimension': dimension, 'key': key, 'windows': windows})
+    window = request.args.get('window', '24h')
+    try:
+        rows = trending.trending(
+            dimension,
+            window=window,
+            sort=request.args.get('sort', 'volume'),
+            limit=request.args.get('limit', default=10, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'dimension': dimension, 'window': window, 'trending': rows})
+
+@app.route('/api/sentiment/stats', methods=['GET'])
+def sentiment_store_stats():
+    return jsonify({**sentiment_store.stats(), 'trending_keys': trending.stats()})
+
+@app.route('/api/ingest/stats', methods=['GET'])
+def ingest_stats():
+    return jsonify(ingestion.stats())
+
+@app.route('/api/models/memory', methods=['GET'])
+def model_memory():
+    return jsonify({"pid": os.getpid(), "models": registry.memory_usage()})
+
+@app.route('/api/reddit/stats', methods=['GET'])
+def reddit_stats():
+    return jsonify(reddit_pool.stats())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({**result_cache.stats(), 'listings': listing_cache.stats(), 'avatars': avatar_cache.stats(),
+                    'post_index': post_index.stats(), 'author_index': author_index.stats()})
+
 @app.route('/api/posts/user/<username>', methods=['GET'])
 def get_user_posts(username):
     try:
         limit = request.args.get('limit', default=10, type=int)
-        reddit = get_reddit_client()
-        # Fetch posts by Redditor (user)
-        redditor = reddit.redditor(username)
-        posts = []
-        for submission in redditor.submissions.new(limit=limit):
-            posts.append({
-                'post_id': submission.id,
-                'title': submission.title,
-                'text': submission.selftext,
-                'url': submission.url,
-                'images': [submission.url] if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')) else [],
-                'num_comments': submission.num_comments,
-                'author': str(submission.author),
-                'subreddit': str(submission.subreddit),
-                'timestamp': int(submission.created_utc)
-            })
+
+        def fetch():
+            reddit = get_reddit_client()
+            # Fetch posts by Redditor (user)
+            redditor = reddit.redditor(username)
+            posts = []
+            for submission in redditor.submissions.new(limit=limit):
+                posts.append({
+                    'post_id': submission.id,
+                    'title': submission.title,
+                    'text': submission.selftext,
+                    'url': submission.url,
+                    'images': [submission.url] if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')) else [],
+                    'num_comments': submission.num_comments,
+                    'author': str(submission.author),
+                    'subreddit': str(submission.subreddit),
+                    'timestamp': int(submission.created_utc)
+                })
+            post_index.add(posts)
+            author_index.add(post['author'] for post in posts)
+            return posts
+
+        posts = listing_cache.get_or_fetch(('user', username.lower(), 'new', limit), fetch)
         return jsonify({"posts": posts})
     except Exception as e:
         logging.exception(f"Failed to fetch user posts: {e}")
@@ -108,18 +414,19 @@ def get_timeline_posts():
     try:
         limit = request.args.get('limit', default=10, type=int)
         # List of popular subreddits for timeline
-        subreddits = ['all', 'news', 'worldnews', 'technology', 'funny', 'AskReddit', 'pics', 'gaming', 'science', 'movies']
+        subreddits = list(POPULAR_SUBREDDITS)
         import random
         random.shuffle(subreddits)
-        posts = []
-        for subreddit in subreddits:
-            if len(posts) >= limit:
-                break
-            fetched = get_posts_from_subreddit(subreddit, limit)
-            posts.extend(fetched)
+        results, sources = fanout.run(
+            [(subreddit, functools.partial(get_posts_from_subreddit, subreddit, limit)) for subreddit in subreddits],
+            deadline=FANOUT_DEADLINE,
+            concurrency=FANOUT_CONCURRENCY,
+            stop_when=lambda fetched: sum(len(p) for p in fetched) >= limit,
+        )
+        posts = [post for _, fetched in results for post in fetched]
         random.shuffle(posts)
         posts = posts[:limit]
-        return jsonify({"posts": posts})
+        return jsonify({"posts": posts, "sources": sources})
     except Exception as e:
         logging.exception(f"Failed to fetch timeline posts: {e}")
         return jsonify({"error": f"Failed to fetch timeline posts: {str(e)}"}), 500
@@ -129,18 +436,24 @@ def reddit_feed():
     try:
         subreddit = request.args.get('subreddit', default='python', type=str)
         limit = request.args.get('limit', default=10, type=int)
-        reddit = get_reddit_client()
-        subreddit_obj = reddit.subreddit(subreddit)
-        posts = []
-        for submission in subreddit_obj.hot(limit=limit):
-            posts.append({
-                'post_id': submission.id,
-                'title': submission.title,
-                'text': submission.selftext,
-                'url': submission.url,
-                'images': [submission.url] if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')) else [],
-                'num_comments': submission.num_comments
-            })
+
+        def fetch():
+            reddit = get_reddit_client()
+            subreddit_obj = reddit.subreddit(subreddit)
+            posts = []
+            for submission in subreddit_obj.hot(limit=limit):
+                posts.append({
+                    'post_id': submission.id,
+                    'title': submission.title,
+                    'text': submission.selftext,
+                    'url': submission.url,
+                    'images': [submission.url] if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')) else [],
+                    'num_comments': submission.num_comments
+                })
+            post_index.add(posts)
+            return posts
+
+        posts = listing_cache.get_or_fetch(('reddit_feed', subreddit.lower(), 'hot', limit), fetch)
         return jsonify({'posts': posts})
     except Exception as e:
         logging.exception(f"Failed to fetch subreddit posts: {e}")
@@ -178,6 +491,7 @@ def get_post_and_comments(subreddit, post_id):
             'subreddit': str(submission.subreddit),
             'timestamp': int(submission.created_utc)
         }
+        post_index.add(post)
         submission.comments.replace_more(limit=0)
         comments = []
         for comment in submission.comments.list():
@@ -186,6 +500,7 @@ def get_post_and_comments(subreddit, post_id):
                 'author': str(comment.author),
                 'text': comment.body
             })
+        author_index.add([post['author']] + [comment['author'] for comment in comments])
         return jsonify({'post': post, 'comments': comments})
     except Exception as e:
         logging.exception(f"Failed to fetch post/comments: {e}")
@@ -197,33 +512,47 @@ def search_posts():
     limit = request.args.get('limit', default=20, type=int)
     if not query:
         return jsonify({'posts': [], 'error': 'Query required'}), 400
+    sentiment = request.args.get('sentiment', '').strip() or None
+    subreddit = request.args.get('subreddit', '').strip() or None
+    # Answer from the local index of every post fetched so far
+    posts = post_index.search(query, limit, sentiment=sentiment, subreddit=subreddit)
+    subreddits = [subreddit] if subreddit else POPULAR_SUBREDDITS
+    tasks = [(name, functools.partial(fetch_new_posts, name)) for name in subreddits]
+    if len(posts) >= limit:
+        # Enough local hits: only refresh listings that have gone stale, off the request path
+        for name, fetch in tasks:
+            listing_cache.get_nowait(('subreddit', name.lower(), 'new', SEARCH_TOPUP_LIMIT), fetch)
+        return jsonify({'posts': posts, 'source': 'index'})
+    # Too few hits: top the index up from the newest posts (cached per subreddit) and search again
+    _, sources = fanout.run(
+        [(name, functools.partial(listing_cache.get_or_fetch, ('subreddit', name.lower(), 'new', SEARCH_TOPUP_LIMIT), fetch))
+         for name, fetch in tasks],
+        deadline=FANOUT_DEADLINE,
+        concurrency=FANOUT_CONCURRENCY,
+        stop_when=lambda fetched: len(post_index.search(query, limit, sentiment=sentiment, subreddit=subreddit)) >= limit,
+    )
+    posts = post_index.search(query, limit, sentiment=sentiment, subreddit=subreddit)
+    return jsonify({'posts': posts, 'source': 'index+upstream', 'sources': sources})
+
+def fetch_new_posts(subreddit):
+    """Fetch a subreddit's newest posts into the search index."""
     reddit = get_reddit_client()
-    # Search in a set of popular subreddits
-    subreddits = ['all', 'news', 'worldnews', 'technology', 'funny', 'AskReddit', 'pics', 'gaming', 'science', 'movies']
     posts = []
-    for subreddit in subreddits:
-        try:
-            subreddit_obj = reddit.subreddit(subreddit)
-            for submission in subreddit_obj.new(limit=30):
-                if (query.lower() in (submission.title or '').lower()) or (query.lower() in (submission.selftext or '').lower()):
-                    posts.append({
-                        'post_id': submission.id,
-                        'title': submission.title,
-                        'text': submission.selftext,
-                        'url': submission.url,
-                        'images': [submission.url] if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')) else [],
-                        'num_comments': submission.num_comments,
-                        'author': str(submission.author),
-                        'subreddit': str(submission.subreddit),
-                        'timestamp': int(submission.created_utc)
-                    })
-                    if len(posts) >= limit:
-                        break
-            if len(posts) >= limit:
-                break
-        except Exception as e:
-            logging.warning(f"Failed to search subreddit {subreddit}: {e}")
-    return jsonify({'posts': posts[:limit]})
+    for submission in reddit.subreddit(subreddit).new(limit=SEARCH_TOPUP_LIMIT):
+        posts.append({
+            'post_id': submission.id,
+            'title': submission.title,
+            'text': submission.selftext,
+            'url': submission.url,
+            'images': [submission.url] if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')) else [],
+            'num_comments': submission.num_comments,
+            'author': str(submission.author),
+            'subreddit': str(submission.subreddit),
+            'timestamp': int(submission.created_utc)
+        })
+    post_index.add(posts)
+    author_index.add(post['author'] for post in posts)
+    return posts
 
 @app.route('/api/users/search', methods=['GET'])
 def search_users():
@@ -231,21 +560,15 @@ def search_users():
     limit = request.args.get('limit', default=10, type=int)
     if not query:
         return jsonify({'users': [], 'error': 'Query required'}), 400
-    reddit = get_reddit_client()
-    users = []
-    try:
-        # Reddit's user search is not public API, but we can try to fetch users by searching in 'all' and collecting authors
-        subreddit = reddit.subreddit('all')
-        authors = set()
-        for submission in subreddit.new(limit=200):
-            author = str(submission.author)
-            if author and query.lower() in author.lower():
-                authors.add(author)
-            if len(authors) >= limit:
-                break
-        users = list(authors)[:limit]
-    except Exception as e:
-        logging.warning(f"Failed to search users: {e}")
+    # Reddit has no public user search, so match against every author seen in fetched posts and comments
+    users = author_index.search(query, limit)
+    if len(users) < limit:
+        # Top up from the newest posts in r/all (cached), which also feeds the index
+        try:
+            listing_cache.get_or_fetch(('subreddit', 'all', 'new', SEARCH_TOPUP_LIMIT), functools.partial(fetch_new_posts, 'all'))
+            users = author_index.search(query, limit)
+        except Exception as e:
+            logging.warning(f"Failed to search users: {e}")
     return jsonify({'users': users})
 
 if __name__ == '__main__':
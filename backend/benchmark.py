@@ -0,0 +1,247 @@
+"""Offline latency/throughput benchmark for the analyzers and the analysis endpoints.
+
+Usage: python benchmark.py [--out results.json] [--baseline baseline.json] [--quick]
+
+Every HuggingFace model the analyzers load is replaced by a tiny random-weight
+stand-in with the same architecture family, label layout and head sizes, built
+under --models-dir, and the hub is switched off, so the benchmark runs without
+network access. Absolute numbers are therefore not production latencies, but
+they move with the code paths around the models (tokenization, batching,
+preprocessing, fusion, caching, serialization) and so catch regressions.
+
+Reports p50/p95/p99 latency and throughput per scenario as JSON. With
+--baseline, scenarios whose p50 or p95 regressed by more than --tolerance are
+listed and the exit status is 1.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from io import BytesIO
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+from parity_check import load_sample_texts, make_sample_images, make_texts  # noqa: E402
+
+# Hub ids the analyzers load; each becomes a local directory of the same name
+ROBERTA_TEXT = 'cardiffnlp/twitter-roberta-base-sentiment-latest'
+VIT_SENTIMENT = 'nateraw/vit-base-patch16-224-inat-finetuned-sentiment'
+BERT_BASE = 'bert-base-uncased'
+VIT_LARGE = 'google/vit-large-patch16-224'
+SPECIAL_TOKENS = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+LABELS = {0: 'negative', 1: 'neutral', 2: 'positive'}
+
+
+def build_stand_ins(root, texts, vocab_size=4000):
+    """Write tiny random-weight versions of every hub model under `root` (skipped if already built)."""
+    from collections import Counter
+    from transformers import (BertConfig, BertModel, BertTokenizer, RobertaConfig, RobertaForSequenceClassification,
+                              ViTConfig, ViTForImageClassification, ViTImageProcessor, ViTModel)
+    if os.path.exists(os.path.join(root, VIT_LARGE, 'config.json')):
+        return root
+    # A word-level vocabulary from the sample texts keeps token counts close to real ones
+    words = Counter(word for text in texts for word in text.lower().split())
+    vocab = SPECIAL_TOKENS + [word for word, _ in words.most_common(vocab_size)]
+    vocab_path = os.path.join(root, 'vocab.txt')
+    os.makedirs(root, exist_ok=True)
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab))
+    tokenizer = BertTokenizer(vocab_path)
+    small = dict(num_hidden_layers=2, num_attention_heads=2, intermediate_size=128)
+
+    text_dir = os.path.join(root, ROBERTA_TEXT)
+    tokenizer.save_pretrained(text_dir)
+    RobertaForSequenceClassification(RobertaConfig(
+        vocab_size=len(vocab), hidden_size=64, max_position_embeddings=514, pad_token_id=0,
+        num_labels=3, id2label=LABELS, label2id={v: k for k, v in LABELS.items()}, **small
+    )).save_pretrained(text_dir)
+
+    image_dir = os.path.join(root, VIT_SENTIMENT)
+    ViTImageProcessor(size={'height': 64, 'width': 64}).save_pretrained(image_dir)
+    ViTForImageClassification(ViTConfig(
+        image_size=64, patch_size=16, hidden_size=64, num_labels=3, id2label=LABELS,
+        label2id={v: k for k, v in LABELS.items()}, **small
+    )).save_pretrained(image_dir)
+
+    # The comments analyzer puts fixed-size heads on these, so keep their hidden sizes (768 / 1024)
+    bert_dir = os.path.join(root, BERT_BASE)
+    tokenizer.save_pretrained(bert_dir)
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=768, num_hidden_layers=1, num_attention_heads=4,
+                         intermediate_size=256)).save_pretrained(bert_dir)
+    vit_dir = os.path.join(root, VIT_LARGE)
+    ViTImageProcessor(size={'height': 64, 'width': 64}).save_pretrained(vit_dir)
+    ViTModel(ViTConfig(image_size=64, patch_size=16, hidden_size=1024, num_hidden_layers=1, num_attention_heads=4,
+                       intermediate_size=256)).save_pretrained(vit_dir)
+    return root
+
+
+def measure(fn, iterations, warmup, items=1):
+    """Run `fn(i)` `iterations` times after `warmup` untimed calls; latency percentiles in ms."""
+    for i in range(warmup):
+        fn(-1 - i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'iterations': iterations,
+        'items_per_call': items,
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(np.mean(latencies)), 3),
+        'throughput_items_per_s': round(iterations * items / elapsed, 2) if elapsed else None,
+    }
+
+
+def image_payload(image):
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def run_benchmarks(args, sample):
+    from models.advanced_multimodal_sentiment import AdvancedMultimodalSentimentAnalyzer
+    from models.sentiment_model import MultimodalSentimentAnalyzer
+    results = {}
+    n, warmup = args.iterations, args.warmup
+    images = {size: make_sample_images(count=4, size=size) for size in args.image_sizes}
+
+    def run(name, fn, items=1, iterations=n):
+        results[name] = measure(fn, iterations, warmup, items)
+        print(f"{name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+
+    advanced = AdvancedMultimodalSentimentAnalyzer(precision=args.precision)
+    comments = MultimodalSentimentAnalyzer(precision=args.precision)
+    for words in args.text_lengths:
+        texts = make_texts(sample, words, n + warmup)
+        run(f'advanced.analyze/text/{words}w', lambda i, t=texts: advanced.analyze(t[i]))
+        run(f'comments.analyze/text/{words}w', lambda i, t=texts: comments.analyze(t[i]))
+        run(f'comments.analyze_content_based/{words}w', lambda i, t=texts: comments.analyze_content_based(t[i]))
+    for size, imgs in images.items():
+        run(f'advanced.analyze/image/{size}px', lambda i, im=imgs: advanced.analyze(None, im[i % len(im)]))
+        run(f'advanced.analyze/text+image/{size}px',
+            lambda i, im=imgs: advanced.analyze(sample[i % len(sample)], im[i % len(im)]))
+    words = args.text_lengths[len(args.text_lengths) // 2]
+    for batch_size in args.batch_sizes:
+        batches = [make_texts(sample, words, batch_size, offset=i * batch_size) for i in range(n + warmup)]
+        run(f'advanced.analyze_batch/{batch_size}x{words}w',
+            lambda i, b=batches, bs=batch_size: advanced.analyze_batch(b[i], batch_size=bs), items=batch_size)
+        run(f'comments.analyze_batch/{batch_size}x{words}w',
+            lambda i, b=batches, bs=batch_size: comments.analyze_batch(b[i], batch_size=bs), items=batch_size)
+        run(f'comments.analyze_content_based_batch/{batch_size}x{words}w',
+            lambda i, b=batches: comments.analyze_content_based_batch(b[i]), items=batch_size)
+
+    # Endpoints through the Flask test client, with distinct texts so the result cache never answers
+    import app as app_module
+    client = app_module.app.test_client()
+    texts = make_texts(sample, words, n + warmup, offset=10 ** 6)
+    run(f'POST /api/analyze/text/{words}w', lambda i: client.post('/api/analyze', json={'text': texts[i]}))
+    for size, imgs in images.items():
+        payloads = [image_payload(image) for image in imgs]
+        run(f'POST /api/analyze/text+image/{size}px',
+            lambda i, p=payloads: client.post('/api/analyze', json={'text': texts[i], 'image': p[i % len(p)]}))
+    cached = texts[0]
+    run('POST /api/analyze/cached', lambda i: client.post('/api/analyze', json={'text': cached}))
+    for batch_size in args.batch_sizes:
+        batches = [make_texts(sample, words, batch_size, offset=2 * 10 ** 6 + i * batch_size) for i in range(n + warmup)]
+        run(f'POST /api/analyze/comments/{batch_size}x{words}w',
+            lambda i, b=batches: client.post('/api/analyze/comments', json={'comments': b[i]}), items=batch_size)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p50 or p95 grew by more than `tolerance` (a fraction) versus the baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': previous[metric],
+                                    'current': current[metric], 'ratio': round(current[metric] / previous[metric], 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', help='Write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50/p95 slowdown, e.g. 0.2 for 20%%')
+    parser.add_argument('--models-dir', help='Where to build (or reuse) the stand-in models; default: a temp dir')
+    parser.add_argument('--precision', default='fp32', choices=['fp32', 'int8', 'bf16'])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--text-lengths', type=lambda s: [int(x) for x in s.split(',')], default=[8, 64, 256])
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[1, 8, 32])
+    parser.add_argument('--image-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[64, 512])
+    parser.add_argument('--threads', type=int, help='torch intra-op threads (default: torch default)')
+    parser.add_argument('--quick', action='store_true', help='Few iterations, for smoke testing')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.iterations, args.warmup = 5, 1
+
+    work_dir = tempfile.mkdtemp(prefix='sentiment-bench-')
+    models_dir = os.path.abspath(args.models_dir or os.path.join(work_dir, 'models'))
+    # Everything stays local: no hub access, and caches/stores never touch the real ones
+    os.environ.update({
+        'HF_HUB_OFFLINE': '1',
+        'TRANSFORMERS_OFFLINE': '1',
+        'MODEL_CACHE_DIR': os.path.join(work_dir, 'registry'),
+        'SENTIMENT_STORE_DB': os.path.join(work_dir, 'sentiment_store.db'),
+        'WARMUP_MODALITIES': '',
+        'INGEST_SUBREDDITS': '',
+        'INGEST_HASHTAGS': '',
+        'INFERENCE_PRECISION': args.precision,
+    })
+    os.environ.pop('RESULT_CACHE_DB', None)
+    import torch
+    import transformers
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    sample = load_sample_texts()
+    build_stand_ins(models_dir, sample)
+    # Hub ids resolve to the stand-in directories relative to the working directory
+    os.chdir(models_dir)
+
+    results = run_benchmarks(args, sample)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'transformers': transformers.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'torch_threads': torch.get_num_threads(),
+            'precision': args.precision,
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.tolerance)
+        status = 1 if report['regressions'] else 0
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Export the AdvancedMultimodalSentimentAnalyzer classifiers to static graphs.
+
+Usage: python export_models.py --format torchscript|onnx --output exported_models
+
+Writes text.{pt,onnx}, image.{pt,onnx}, the tokenizer and feature extractor,
+and a manifest.json. Serve them with INFERENCE_BACKEND=<format> and
+EXPORT_DIR=<output>.
+"""
+import argparse
+import json
+import os
+import sys
+from PIL import Image
+from models.advanced_multimodal_sentiment import AdvancedMultimodalSentimentAnalyzer
+from models.exported_backend import IMAGE_INPUTS, MANIFEST_NAME, TEXT_INPUTS, export_classifier, exported_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', default='torchscript', choices=['torchscript', 'onnx'])
+    parser.add_argument('--output', default='exported_models')
+    parser.add_argument('--precision', default='fp32', choices=['fp32', 'int8'],
+                        help='int8 dynamic quantization is only exportable to torchscript')
+    args = parser.parse_args(argv)
+    if args.format == 'onnx' and args.precision != 'fp32':
+        parser.error('ONNX export supports fp32 only')
+
+    os.makedirs(args.output, exist_ok=True)
+    analyzer = AdvancedMultimodalSentimentAnalyzer(precision=args.precision)
+    analyzer.warm_up(['text', 'image'], background=False)
+
+    # Two examples of different lengths so the trace does not specialize on one shape
+    text_inputs = analyzer.tokenizer(['Great news today!', 'This is a somewhat longer example sentence for tracing.'],
+                                     return_tensors='pt', padding=True)
+    export_classifier(analyzer.text_model, [text_inputs[name] for name in TEXT_INPUTS],
+                      exported_path(args.output, 'text', args.format), TEXT_INPUTS)
+    image_inputs = analyzer.feature_extractor(images=[Image.new('RGB', (224, 224))] * 2, return_tensors='pt')
+    export_classifier(analyzer.image_model, [image_inputs[name] for name in IMAGE_INPUTS],
+                      exported_path(args.output, 'image', args.format), IMAGE_INPUTS)
+
+    analyzer.tokenizer.save_pretrained(os.path.join(args.output, 'tokenizer'))
+    analyzer.feature_extractor.save_pretrained(os.path.join(args.output, 'feature_extractor'))
+    # AutoFeatureExtractor resolves the processor class from the model config
+    analyzer.image_model.config.save_pretrained(os.path.join(args.output, 'feature_extractor'))
+    manifest = {
+        'format': args.format,
+        'precision': analyzer.precision,
+        'text_model_name': analyzer.text_model_name,
+        'image_model_name': analyzer.image_model_name,
+        'real_image_sentiment': analyzer.real_image_sentiment,
+        'image_id2label': {str(idx): label for idx, label in analyzer.image_id2label.items()},
+    }
+    with open(os.path.join(args.output, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Exported {args.format} models to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
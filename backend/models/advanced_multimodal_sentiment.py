@@ -1,113 +1,220 @@
+import os
 import numpy as np
 from PIL import Image
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, AutoFeatureExtractor, AutoModelForImageClassification
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification, AutoFeatureExtractor, AutoModelForImageClassification
+from transformers.modeling_utils import no_init_weights
 import logging
+from .lazy_loading import LazyModalityLoader
+from .exported_backend import BACKENDS, IMAGE_INPUTS, TEXT_INPUTS, ExportedClassifier, exported_path, load_manifest
+from .model_registry import registry
+from .precision import apply_precision, inference_context, resolve_precision
+from .stages import stage
 
 class AdvancedMultimodalSentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, precision='fp32', backend='eager', export_dir=None):
         logging.info("Initializing AdvancedMultimodalSentimentAnalyzer...")
+        # Inference precision: fp32, int8 (dynamic quantization) or bf16 (autocast)
+        self.precision = resolve_precision(precision)
+        # Inference backend: eager HuggingFace models, or graphs written by export_models.py
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.export_dir = export_dir
         # Use a 3-class sentiment model for text
         self.text_model_name = 'cardiffnlp/twitter-roberta-base-sentiment-latest'
+        # Try to use a real image sentiment model, fallback to old method if unavailable
+        self.image_model_name = 'nateraw/vit-base-patch16-224-inat-finetuned-sentiment'
+        if backend != 'eager':
+            if not export_dir:
+                raise ValueError(f"The {backend} backend needs export_dir")
+            # Exported graphs record which models (and precision) they were built from
+            self.manifest = load_manifest(export_dir)
+            self.text_model_name = self.manifest['text_model_name']
+            self.image_model_name = self.manifest['image_model_name']
+            self.precision = self.manifest['precision']
+        self.sentiment_labels = ['Negative', 'Neutral', 'Positive']
+        # Models are loaded per modality on first use (or by warm_up)
+        self.loader = LazyModalityLoader({'text': self._load_text_model, 'image': self._load_image_model})
+        logging.info("AdvancedMultimodalSentimentAnalyzer initialized successfully.")
+
+    @property
+    def model_id(self):
+        # Identifies the models behind a result, e.g. for cache keys
+        return f"{self.text_model_name}|{self.image_model_name}|{self.precision}|{self.backend}"
+
+    def warm_up(self, modalities=None, background=True):
+        return self.loader.warm_up(modalities, background=background)
+
+    def _load_text_model(self):
+        if self.backend != 'eager':
+            self.tokenizer = AutoTokenizer.from_pretrained(os.path.join(self.export_dir, 'tokenizer'))
+            self.text_model = ExportedClassifier(exported_path(self.export_dir, 'text', self.backend), TEXT_INPUTS)
+            return
         self.tokenizer = AutoTokenizer.from_pretrained(self.text_model_name)
-        self.text_model = AutoModelForSequenceClassification.from_pretrained(self.text_model_name)
-        self.text_model.eval()
+        self.text_model = apply_precision(self._load_registered(AutoModelForSequenceClassification, self.text_model_name), self.precision)
 
-        # Try to use a real image sentiment model, fallback to old method if unavailable
+    def _load_image_model(self):
+        if self.backend != 'eager':
+            self.feature_extractor = AutoFeatureExtractor.from_pretrained(os.path.join(self.export_dir, 'feature_extractor'))
+            self.image_model = ExportedClassifier(exported_path(self.export_dir, 'image', self.backend), IMAGE_INPUTS)
+            self.image_id2label = {int(idx): label for idx, label in self.manifest['image_id2label'].items()}
+            self.real_image_sentiment = self.manifest['real_image_sentiment']
+            self.image_sentiment_labels = list(self.image_id2label.values()) if self.real_image_sentiment else None
+            return
         try:
-            self.image_model_name = 'nateraw/vit-base-patch16-224-inat-finetuned-sentiment'
             self.feature_extractor = AutoFeatureExtractor.from_pretrained(self.image_model_name)
-            self.image_model = AutoModelForImageClassification.from_pretrained(self.image_model_name)
-            self.image_model.eval()
-            self.image_sentiment_labels = list(self.image_model.config.id2label.values())
+            self.image_model = apply_precision(self._load_registered(AutoModelForImageClassification, self.image_model_name), self.precision)
+            self.image_id2label = dict(self.image_model.config.id2label)
+            self.image_sentiment_labels = list(self.image_id2label.values())
             self.real_image_sentiment = True
             logging.info('Loaded real image sentiment model.')
         except Exception as e:
             logging.warning(f'Could not load real image sentiment model: {e}. Falling back to heuristic.')
             self.image_model_name = 'google/vit-base-patch16-224'
             self.feature_extractor = AutoFeatureExtractor.from_pretrained(self.image_model_name)
-            self.image_model = AutoModelForImageClassification.from_pretrained(self.image_model_name)
-            self.image_model.eval()
+            self.image_model = apply_precision(self._load_registered(AutoModelForImageClassification, self.image_model_name), self.precision)
+            self.image_id2label = dict(self.image_model.config.id2label)
             self.image_sentiment_labels = None
             self.real_image_sentiment = False
 
-        self.sentiment_labels = ['Negative', 'Neutral', 'Positive']
-        logging.info("AdvancedMultimodalSentimentAnalyzer initialized successfully.")
+    @staticmethod
+    def _load_registered(model_class, model_name):
+        """Load a hub model through the shared registry so workers share its weights."""
+        def skeleton():
+            # Architecture only; the registry maps the cached weights in afterwards
+            with no_init_weights():
+                return model_class.from_config(AutoConfig.from_pretrained(model_name))
+        return registry.load(model_name, lambda: model_class.from_pretrained(model_name), skeleton)
 
     def analyze_text(self, text):
-        if not text or not text.strip():
-            return np.array([0.333, 0.334, 0.333])
-        try:
-            # Tokenize input text
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=512)
-            # Get model predictions
-            with torch.no_grad():
-                outputs = self.text_model(**inputs)
-                logits = outputs.logits
-                probs = torch.softmax(logits, dim=1).numpy()[0]
-            # The model outputs [negative, neutral, positive] directly
+        return self.analyze_text_batch([text])[0]
+
+    def analyze_text_batch(self, texts, batch_size=32):
+        """Score a list of texts, returning an (N, 3) array.
+
+        Texts are sorted by length and split into buckets of `batch_size`; each
+        bucket is tokenized in one padded call, so its forward pass only pads to
+        the longest text in that bucket.
+        """
+        probs = np.tile(np.array([0.333, 0.334, 0.333]), (len(texts), 1))
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
             return probs
+        self.loader.ensure('text')
+        try:
+            # Character length is a close enough proxy for token length to group similar texts
+            order = sorted(indices, key=lambda i: len(texts[i]))
+            for start in range(0, len(order), batch_size):
+                bucket = order[start:start + batch_size]
+                with stage('tokenize'):
+                    inputs = self.tokenizer([texts[i] for i in bucket], padding=True, truncation=True,
+                                            max_length=512, return_tensors="pt")
+                # Get model predictions
+                with stage('text_forward'), inference_context(self.precision):
+                    outputs = self.text_model(**inputs)
+                    logits = outputs.logits
+                    # The model outputs [negative, neutral, positive] directly
+                    probs[bucket] = torch.softmax(logits.float(), dim=1).numpy()
         except Exception as e:
             logging.error(f"Error analyzing text: {e}")
-            return np.array([0.333, 0.334, 0.333])
+        return probs
 
     def analyze_image(self, image):
-        if not isinstance(image, Image.Image):
-            return np.array([0.333, 0.334, 0.333])
+        return self.analyze_image_batch([image])[0]
+
+    def analyze_image_batch(self, images, batch_size=32):
+        """Score a list of PIL images in forward passes of `batch_size`, returning an (N, 3) array."""
+        probs = np.tile(np.array([0.333, 0.334, 0.333]), (len(images), 1))
+        indices = [i for i, image in enumerate(images) if isinstance(image, Image.Image)]
+        if not indices:
+            return probs
+        self.loader.ensure('image')
         try:
-            inputs = self.feature_extractor(images=image, return_tensors="pt")
-            with torch.no_grad():
-                outputs = self.image_model(**inputs)
-                logits = outputs.logits
-                probs = torch.softmax(logits, dim=1).numpy()[0]
-            if self.real_image_sentiment and self.image_sentiment_labels:
-                # Sentiment model: map output to negative/neutral/positive
-                # Assume 3-class: negative, neutral, positive
-                if len(probs) == 3:
-                    return probs
-                # If more classes, try to sum appropriately (fallback)
-                idx_map = {lbl.lower(): i for i, lbl in enumerate(self.image_sentiment_labels)}
-                negative = probs[idx_map.get('negative', 0)] if 'negative' in idx_map else probs[0]
-                neutral = probs[idx_map.get('neutral', 1)] if 'neutral' in idx_map else probs[1]
-                positive = probs[idx_map.get('positive', 2)] if 'positive' in idx_map else probs[2]
-                return np.array([negative, neutral, positive])
-            else:
-                # Heuristic fallback (ImageNet)
-                top_indices = np.argsort(probs)[-5:][::-1]
-                top_probs = probs[top_indices]
-                positive_keywords = ['happy', 'smile', 'celebration', 'party', 'joy', 'success', 'beauty', 'sun', 'bright']
-                negative_keywords = ['sad', 'angry', 'disaster', 'accident', 'damage', 'dark', 'storm', 'war', 'conflict']
-                positive_score = 0.0
-                negative_score = 0.0
-                for idx, prob in zip(top_indices, top_probs):
-                    label = self.image_model.config.id2label[idx].lower()
-                    if any(kw in label for kw in positive_keywords):
-                        positive_score += prob
-                    elif any(kw in label for kw in negative_keywords):
-                        negative_score += prob
-                if positive_score > negative_score * 1.5:
-                    return np.array([0.1, 0.3, 0.6])
-                elif negative_score > positive_score * 1.5:
-                    return np.array([0.6, 0.3, 0.1])
-                else:
-                    return np.array([0.3, 0.4, 0.3])
+            for start in range(0, len(indices), batch_size):
+                bucket = indices[start:start + batch_size]
+                with stage('feature_extraction'):
+                    inputs = self.feature_extractor(images=[images[i] for i in bucket], return_tensors="pt")
+                with stage('image_forward'), inference_context(self.precision):
+                    outputs = self.image_model(**inputs)
+                    logits = outputs.logits
+                    batch_probs = torch.softmax(logits.float(), dim=1).numpy()
+                for i, image_probs in zip(bucket, batch_probs):
+                    probs[i] = self._image_sentiment(image_probs)
         except Exception as e:
             logging.error(f"Error analyzing image: {e}")
-            return np.array([0.333, 0.334, 0.333])
+        return probs
+
+    def _image_sentiment(self, probs):
+        if self.real_image_sentiment and self.image_sentiment_labels:
+            # Sentiment model: map output to negative/neutral/positive
+            # Assume 3-class: negative, neutral, positive
+            if len(probs) == 3:
+                return probs
+            # If more classes, try to sum appropriately (fallback)
+            idx_map = {lbl.lower(): i for i, lbl in enumerate(self.image_sentiment_labels)}
+            negative = probs[idx_map.get('negative', 0)] if 'negative' in idx_map else probs[0]
+            neutral = probs[idx_map.get('neutral', 1)] if 'neutral' in idx_map else probs[1]
+            positive = probs[idx_map.get('positive', 2)] if 'positive' in idx_map else probs[2]
+            return np.array([negative, neutral, positive])
+        else:
+            # Heuristic fallback (ImageNet)
+            top_indices = np.argsort(probs)[-5:][::-1]
+            top_probs = probs[top_indices]
+            positive_keywords = ['happy', 'smile', 'celebration', 'party', 'joy', 'success', 'beauty', 'sun', 'bright']
+            negative_keywords = ['sad', 'angry', 'disaster', 'accident', 'damage', 'dark', 'storm', 'war', 'conflict']
+            positive_score = 0.0
+            negative_score = 0.0
+            for idx, prob in zip(top_indices, top_probs):
+                label = self.image_id2label[idx].lower()
+                if any(kw in label for kw in positive_keywords):
+                    positive_score += prob
+                elif any(kw in label for kw in negative_keywords):
+                    negative_score += prob
+            if positive_score > negative_score * 1.5:
+                return np.array([0.1, 0.3, 0.6])
+            elif negative_score > positive_score * 1.5:
+                return np.array([0.6, 0.3, 0.1])
+            else:
+                return np.array([0.3, 0.4, 0.3])
 
     def analyze(self, text=None, image=None):
-        logging.debug(f"Analyzing with text: {bool(text)}, image: {bool(image)}")
+        logging.debug("Analyzing with text: %s, image: %s", bool(text), bool(image))
         text_probs = self.analyze_text(text) if text else None
         image_probs = self.analyze_image(image) if image else None
+        with stage('fusion'):
+            return self.fuse(text_probs, image_probs, text, image)
+
+    def analyze_batch(self, texts=None, images=None, batch_size=32):
+        """Analyze many items at once, returning one `analyze`-shaped dict per item.
+
+        `texts` and `images` are parallel lists; either may be omitted or contain
+        None entries for items missing that modality.
+        """
+        count = max(len(texts or []), len(images or []))
+        texts = list(texts or []) + [None] * (count - len(texts or []))
+        images = list(images or []) + [None] * (count - len(images or []))
+        # Only modalities that analyze() would have scored go into the forward passes
+        text_indices = [i for i, text in enumerate(texts) if text]
+        image_indices = [i for i, image in enumerate(images) if image]
+        text_probs = self.analyze_text_batch([texts[i] for i in text_indices], batch_size) if text_indices else []
+        image_probs = self.analyze_image_batch([images[i] for i in image_indices], batch_size) if image_indices else []
+        text_by_index = dict(zip(text_indices, text_probs))
+        image_by_index = dict(zip(image_indices, image_probs))
+        with stage('fusion'):
+            return [self.fuse(text_by_index.get(i), image_by_index.get(i), texts[i], images[i]) for i in range(count)]
+
+    def fuse(self, text_probs, image_probs, text=None, image=None):
+        """Late-fuse per-modality probabilities into the result dict returned by `analyze`."""
         text_used = text is not None and text.strip() != ''
         image_used = isinstance(image, Image.Image)
         
-        logging.debug(f"Text probs: {text_probs}, Image probs: {image_probs}")
+        logging.debug("Text probs: %s, Image probs: %s", text_probs, image_probs)
         
         # Weighted late fusion - give more weight to text if available
         if text_probs is not None and image_probs is not None:
             final_probs = 0.7 * text_probs + 0.3 * image_probs
-            logging.debug(f"Fusion probs (text 0.7, image 0.3): {final_probs}")
+            logging.debug("Fusion probs (text 0.7, image 0.3): %s", final_probs)
         elif text_probs is not None:
             final_probs = text_probs
         elif image_probs is not None:
@@ -123,5 +230,6 @@ class AdvancedMultimodalSentimentAnalyzer:
             'confidence': float(final_probs[sentiment_idx]),
             'distribution': sentiment_distribution,
             'text_used': text_used,
-            'image_used': image_used
+            'image_used': image_used,
+            'engine': 'model'
         }
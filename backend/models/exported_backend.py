@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+from types import SimpleNamespace
+import torch
+import torch.nn as nn
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+MANIFEST_NAME = 'manifest.json'
+TEXT_INPUTS = ['input_ids', 'attention_mask']
+IMAGE_INPUTS = ['pixel_values']
+
+
+class LogitsOnly(nn.Module):
+    """Wraps a HuggingFace classifier so it takes positional tensors and returns plain logits."""
+
+    def __init__(self, model):
+        super(LogitsOnly, self).__init__()
+        self.model = model
+
+    def forward(self, *inputs):
+        names = IMAGE_INPUTS if len(inputs) == 1 else TEXT_INPUTS
+        return self.model(**dict(zip(names, inputs))).logits
+
+
+class ExportedClassifier:
+    """Runs an exported classifier graph with the eager model's calling convention.
+
+    Called with the tokenizer/feature-extractor outputs as keyword tensors and
+    returns an object with a `.logits` tensor, so analyzers can swap it in for
+    the HuggingFace model without changing their forward code.
+    """
+
+    def __init__(self, path, input_names):
+        self.path = path
+        self.input_names = input_names
+        if path.endswith('.onnx'):
+            try:
+                import onnxruntime
+            except ImportError:
+                raise RuntimeError("The onnx backend requires the onnxruntime package")
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+            self._module = None
+        else:
+            self._session = None
+            self._module = torch.jit.load(path, map_location='cpu').eval()
+            try:
+                # Freeze and fuse the graph for CPU inference
+                self._module = torch.jit.optimize_for_inference(self._module)
+            except Exception as e:
+                logging.warning(f"Could not optimize {path} for inference, running it unfrozen: {e}")
+
+    def __call__(self, **inputs):
+        tensors = [inputs[name] for name in self.input_names]
+        if self._module is not None:
+            logits = self._module(*tensors)
+        else:
+            feeds = {name: tensor.numpy() for name, tensor in zip(self.input_names, tensors)}
+            logits = torch.from_numpy(self._session.run(None, feeds)[0])
+        return SimpleNamespace(logits=logits)
+
+
+def exported_path(export_dir, modality, backend):
+    return os.path.join(export_dir, f"{modality}.{'onnx' if backend == 'onnx' else 'pt'}")
+
+
+def load_manifest(export_dir):
+    with open(os.path.join(export_dir, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def export_classifier(model, example_inputs, path, input_names):
+    """Write `model` to `path` as a TorchScript trace (.pt) or ONNX graph (.onnx)."""
+    wrapper = LogitsOnly(model).eval()
+    with torch.no_grad():
+        if path.endswith('.onnx'):
+            # Batch and sequence length stay dynamic so any padded batch can run
+            dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names if name != 'pixel_values'}
+            dynamic_axes.update({name: {0: 'batch'} for name in input_names if name == 'pixel_values'})
+            dynamic_axes['logits'] = {0: 'batch'}
+            torch.onnx.export(
+                wrapper, tuple(example_inputs), path, input_names=input_names, output_names=['logits'],
+                dynamic_axes=dynamic_axes, opset_version=17
+            )
+        else:
+            traced = torch.jit.trace(wrapper, tuple(example_inputs), strict=False)
+            torch.jit.save(traced, path)
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+
+class LazyModalityLoader:
+    """Loads each modality's models on first use instead of at construction.
+
+    `loaders` maps a modality name (e.g. 'text', 'image') to a callable that
+    loads its components. Loading is thread-safe and happens at most once per
+    modality; a failed load is retried on the first use after `retry_after`
+    seconds, and uses before that fail fast.
+    """
+
+    def __init__(self, loaders, retry_after=60):
+        self._loaders = dict(loaders)
+        self.retry_after = retry_after
+        self._failed_at = {}
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        self.state = {name: 'not_loaded' for name in self._loaders}
+        self.load_seconds = {}
+        self.errors = {}
+
+    def ensure(self, name):
+        if self.state[name] == 'loaded':
+            return
+        if self.state[name] == 'failed' and time.monotonic() - self._failed_at[name] < self.retry_after:
+            raise RuntimeError(f"Loading {name} models failed: {self.errors[name]}")
+        with self._locks[name]:
+            if self.state[name] == 'loaded':
+                return
+            self.state[name] = 'loading'
+            start = time.perf_counter()
+            try:
+                self._loaders[name]()
+            except Exception as e:
+                self.state[name] = 'failed'
+                self._failed_at[name] = time.monotonic()
+                self.errors[name] = str(e)
+                raise
+            self.load_seconds[name] = time.perf_counter() - start
+            self.errors.pop(name, None)
+            self.state[name] = 'loaded'
+            logging.info("Loaded %s models in %.2fs", name, self.load_seconds[name])
+
+    def is_loaded(self, name):
+        return self.state.get(name) == 'loaded'
+
+    def warm_up(self, names=None, background=True):
+        """Load the given modalities (all by default), optionally on a daemon thread."""
+        names = [name for name in (names or self._loaders) if name in self._loaders]
+
+        def run():
+            for name in names:
+                try:
+                    self.ensure(name)
+                except Exception as e:
+                    logging.exception("Warm-up of %s models failed: %s", name, e)
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def start_loading(self, names):
+        """Load in the background any of `names` not loaded or already loading; True once all are loaded."""
+        now = time.monotonic()
+        missing = [name for name in names if name in self._loaders and self.state[name] != 'loaded']
+        startable = [
+            name for name in missing
+            if self.state[name] == 'not_loaded'
+            or (self.state[name] == 'failed' and now - self._failed_at[name] >= self.retry_after)
+        ]
+        if startable:
+            self.warm_up(startable, background=True)
+        return not missing
+
+    def status(self):
+        return {
+            name: {
+                'state': self.state[name],
+                'load_seconds': self.load_seconds.get(name),
+                'error': self.errors.get(name),
+            }
+            for name in self._loaders
+        }
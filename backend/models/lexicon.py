@@ -0,0 +1,81 @@
+import re
+import numpy as np
+
+# Column order of the count arrays produced by CompiledLexicon
+NEGATION, POSITIVE, NEGATIVE, POSITIVE_EMOJI, NEGATIVE_EMOJI = range(5)
+
+
+class CompiledLexicon:
+    """Scores texts against word and emoji lexicons in a single pass.
+
+    All emoji (longest first, so multi-codepoint sequences such as '❤️' win
+    over their prefixes) and the word pattern are compiled into one regex.
+    Each text is lowercased and tokenized by that regex once, and every token is
+    classified with a single dict lookup.
+    """
+
+    def __init__(self, positive_words, negative_words, negation_words=(), positive_emojis=(),
+                 negative_emojis=(), word_pattern=r"[\w']+"):
+        self._categories = {}
+        for category, tokens in ((POSITIVE, positive_words), (NEGATIVE, negative_words),
+                                 (POSITIVE_EMOJI, positive_emojis), (NEGATIVE_EMOJI, negative_emojis),
+                                 (NEGATION, negation_words)):
+            for token in tokens:
+                self._categories[token.lower()] = category
+        emojis = sorted(set(positive_emojis) | set(negative_emojis), key=len, reverse=True)
+        alternatives = [re.escape(emoji) for emoji in emojis] + [word_pattern]
+        self._pattern = re.compile('|'.join(alternatives))
+
+    def count(self, text):
+        """Return [negation, positive, negative, positive_emoji, negative_emoji] counts."""
+        counts = [0, 0, 0, 0, 0]
+        if not text:
+            return counts
+        lookup = self._categories.get
+        for token in self._pattern.findall(text.lower()):
+            category = lookup(token)
+            if category is not None:
+                counts[category] += 1
+        return counts
+
+    def count_batch(self, texts):
+        """Return an (N, 5) int array of counts for a list of texts."""
+        count = self.count
+        return np.array([count(text) for text in texts], dtype=np.int64).reshape(-1, 5)
+
+
+def content_based_scores(counts):
+    """Vectorized content-based scoring of an (N, 5) count array.
+
+    Returns (sentiment_idx, confidence, distribution) arrays with sentiment
+    indices into ['Negative', 'Neutral', 'Positive'] and an (N, 3) distribution.
+    """
+    counts = np.asarray(counts, dtype=np.float64).reshape(-1, 5)
+    # Odd number of negations flips the dominant sentiment
+    has_negation = counts[:, NEGATION] % 2 == 1
+    positive_score = counts[:, POSITIVE] + counts[:, POSITIVE_EMOJI]
+    negative_score = counts[:, NEGATIVE] + counts[:, NEGATIVE_EMOJI]
+    text_score = np.where(has_negation, negative_score - positive_score, positive_score - negative_score)
+    # Normalize score to range [-1, 1]
+    total_counts = np.maximum(1, positive_score + negative_score)
+    text_score = text_score / total_counts
+    # Higher confidence with more sentiment words
+    confidence = np.where(total_counts > 3, np.minimum(0.95, 0.7 + (total_counts - 3) * 0.05), 0.7)
+
+    magnitude = np.abs(text_score)
+    positive = text_score > 0.1
+    negative = text_score < -0.1
+    sentiment_idx = np.where(positive, 2, np.where(negative, 0, 1))
+    distribution = np.where(
+        positive[:, None],
+        np.stack([0.1 - text_score * 0.05, 0.3 - text_score * 0.1, 0.6 + text_score * 0.4], axis=1),
+        np.where(
+            negative[:, None],
+            np.stack([0.6 + magnitude * 0.4, 0.3 - magnitude * 0.1, 0.1 - magnitude * 0.05], axis=1),
+            np.stack([0.2 + magnitude * 0.2, 0.6 - magnitude * 0.2, 0.2 + text_score * 0.2], axis=1),
+        ),
+    )
+    distribution = np.clip(distribution, 0, 1)
+    # Normalize distribution to sum to 1
+    distribution = distribution / distribution.sum(axis=1, keepdims=True)
+    return sentiment_idx, confidence, distribution
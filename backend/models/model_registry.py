@@ -0,0 +1,106 @@
+import logging
+import os
+import re
+import threading
+import torch
+
+
+class ModelRegistry:
+    """Process-wide registry of loaded models backed by a local mmap weight cache.
+
+    The first time a model is requested, `build()` loads it normally (e.g. via
+    `from_pretrained`) and its state dict is written to `cache_dir`. From then
+    on every process maps that file read-only with `torch.load(mmap=True)` and
+    points the model's parameters at the mapping, so all workers on a box share
+    one copy of the weights through the page cache. When a cached file exists,
+    `skeleton()` (if given) builds the architecture without downloading weights.
+
+    With no `cache_dir` the registry only deduplicates models within a process.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._models = {}
+        self._paths = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, re.sub(r'[^A-Za-z0-9._-]+', '--', key) + '.pt')
+
+    def load(self, key, build, skeleton=None):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Different models load concurrently; the same model loads once
+        with key_lock:
+            if key in self._models:
+                return self._models[key]
+            if not self.cache_dir:
+                model = build()
+            else:
+                path = self._path(key)
+                if os.path.exists(path) and skeleton is not None:
+                    model = skeleton()
+                else:
+                    model = build()
+                    if not os.path.exists(path):
+                        # Write atomically so concurrent workers never map a partial file
+                        tmp_path = f"{path}.{os.getpid()}.tmp"
+                        torch.save(model.state_dict(), tmp_path)
+                        os.replace(tmp_path, path)
+                        logging.info("Cached weights for %s at %s", key, path)
+                state_dict = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+                model.load_state_dict(state_dict, assign=True)
+                self._paths[key] = os.path.realpath(path)
+            model.eval()
+            self._models[key] = model
+            return model
+
+    def memory_usage(self):
+        """Report parameter bytes and, for mmap-backed models, resident/proportional memory."""
+        mapped = _mapped_file_memory(set(self._paths.values()))
+        usage = {}
+        for key, model in list(self._models.items()):
+            entry = {
+                'param_bytes': sum(p.numel() * p.element_size() for p in model.parameters()),
+                'mmap_path': self._paths.get(key),
+            }
+            if key in self._paths:
+                entry.update(mapped.get(self._paths[key], {'rss_bytes': 0, 'pss_bytes': 0, 'shared_bytes': 0}))
+            usage[key] = entry
+        return usage
+
+
+def _mapped_file_memory(paths):
+    """Sum Rss/Pss/Shared for the given mapped files from /proc/self/smaps (Linux only)."""
+    totals = {}
+    if not paths:
+        return totals
+    try:
+        with open('/proc/self/smaps') as f:
+            current = None
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if not fields[0].endswith(':'):
+                    # Mapping header: address perms offset dev inode [pathname]
+                    current = fields[5] if len(fields) >= 6 and fields[5] in paths else None
+                    if current:
+                        totals.setdefault(current, {'rss_bytes': 0, 'pss_bytes': 0, 'shared_bytes': 0})
+                elif current:
+                    kb = int(fields[1]) * 1024 if len(fields) > 1 and fields[1].isdigit() else 0
+                    if fields[0] == 'Rss:':
+                        totals[current]['rss_bytes'] += kb
+                    elif fields[0] == 'Pss:':
+                        totals[current]['pss_bytes'] += kb
+                    elif fields[0] in ('Shared_Clean:', 'Shared_Dirty:'):
+                        totals[current]['shared_bytes'] += kb
+    except OSError as e:
+        logging.debug("Could not read /proc/self/smaps: %s", e)
+    return totals
+
+
+registry = ModelRegistry(os.environ.get('MODEL_CACHE_DIR') or None)
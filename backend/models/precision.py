@@ -0,0 +1,45 @@
+import contextlib
+import logging
+import torch
+import torch.nn as nn
+
+PRECISIONS = ('fp32', 'int8', 'bf16')
+
+
+def bf16_supported():
+    """Whether this CPU has native bf16 kernels (AVX512-BF16/AMX) available to oneDNN."""
+    try:
+        return torch.backends.mkldnn.is_available() and bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def resolve_precision(precision):
+    precision = (precision or 'fp32').lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision '{precision}', expected one of {PRECISIONS}")
+    if precision == 'bf16' and not bf16_supported():
+        logging.warning("bf16 inference requested but not supported by this CPU; using fp32")
+        return 'fp32'
+    return precision
+
+
+def apply_precision(model, precision):
+    """Return the model to run for `precision`.
+
+    int8 returns a dynamically quantized copy (Linear layers only), leaving the
+    shared fp32 model untouched. fp32 and bf16 return the model as-is; bf16 is
+    applied at call time by `inference_context`.
+    """
+    if precision == 'int8':
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def inference_context(precision):
+    """Context for forward passes: no_grad, plus bf16 autocast when requested."""
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.no_grad())
+    if precision == 'bf16':
+        stack.enter_context(torch.autocast('cpu', dtype=torch.bfloat16))
+    return stack
@@ -1,15 +1,26 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from transformers import BertTokenizer, BertModel, ViTFeatureExtractor, ViTModel
+from transformers import BertConfig, BertTokenizer, BertModel, ViTConfig, ViTFeatureExtractor, ViTModel
+from transformers.modeling_utils import no_init_weights
 from PIL import Image
 import numpy as np
-import re
+import logging
+import os
+from .lazy_loading import LazyModalityLoader
+from .lexicon import CompiledLexicon, content_based_scores
+from .model_registry import registry
+from .precision import apply_precision, inference_context, resolve_precision
+from .stages import stage
 
 class TextSentimentModel(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained=True):
         super(TextSentimentModel, self).__init__()
-        self.bert = BertModel.from_pretrained('bert-base-uncased')
+        if pretrained:
+            self.bert = BertModel.from_pretrained('bert-base-uncased')
+        else:
+            # Architecture only, for loading weights from a local cache
+            self.bert = BertModel(BertConfig.from_pretrained('bert-base-uncased'))
         self.dropout = nn.Dropout(0.1)
         self.fc = nn.Linear(768, 3)  # 3 sentiment classes: positive, neutral, negative
         
@@ -21,9 +32,13 @@ class TextSentimentModel(nn.Module):
         return logits
 
 class ImageSentimentModel(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained=True):
         super(ImageSentimentModel, self).__init__()
-        self.vit = ViTModel.from_pretrained('google/vit-large-patch16-224')
+        if pretrained:
+            self.vit = ViTModel.from_pretrained('google/vit-large-patch16-224')
+        else:
+            # Architecture only, for loading weights from a local cache
+            self.vit = ViTModel(ViTConfig.from_pretrained('google/vit-large-patch16-224'))
         self.dropout = nn.Dropout(0.1)
         # ViT-L/16 has an embedding dimension of 1024
         self.fc1 = nn.Linear(1024, 512)
@@ -39,27 +54,15 @@ class ImageSentimentModel(nn.Module):
         return logits
 
 class MultimodalSentimentAnalyzer:
-    def __init__(self):
-        # Initialize text components
-        self.text_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-        self.text_model = TextSentimentModel()
-        
-        # Initialize image components
-        self.image_processor = ViTFeatureExtractor.from_pretrained('google/vit-large-patch16-224')
-        self.image_model = ImageSentimentModel()
-        
-        # Load models if available
+    def __init__(self, precision='fp32'):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        try:
-            self.text_model.load_state_dict(torch.load('models/text_sentiment_model.pth', map_location=self.device))
-            self.image_model.load_state_dict(torch.load('models/image_sentiment_model.pth', map_location=self.device))
-        except:
-            print("Warning: Pre-trained models not found. Using content-based sentiment analysis.")
-        
-        self.text_model.to(self.device)
-        self.image_model.to(self.device)
-        self.text_model.eval()
-        self.image_model.eval()
+        # Inference precision: fp32, int8 (dynamic quantization) or bf16 (autocast); CPU only
+        self.precision = resolve_precision(precision)
+        if self.device.type != 'cpu' and self.precision != 'fp32':
+            logging.warning(f"{self.precision} inference is CPU-only; using fp32 on {self.device}")
+            self.precision = 'fp32'
+        # Text and image components are loaded on first use (or by warm_up)
+        self.loader = LazyModalityLoader({'text': self._load_text_model, 'image': self._load_image_model})
         
         self.sentiment_labels = ['Negative', 'Neutral', 'Positive']
         
@@ -98,35 +101,133 @@ class MultimodalSentimentAnalyzer:
                                   '💯', '👍', '👏', '🙌', '🔥', '✅', '💪', '🎉', '🎊', '🥳'])
         self.negative_emojis = set(['😞', '😔', '😟', '😕', '🙁', '☹️', '😣', '😖', '😫', '😩', '😢', 
                                   '😭', '😠', '😡', '🤬', '👎', '❌', '💔', '⛔', '🚫', '😱'])
+        self.lexicon = CompiledLexicon(self.positive_words, self.negative_words, self.negation_words,
+                                       self.positive_emojis, self.negative_emojis)
         
+    @property
+    def model_id(self):
+        # Identifies the models behind a result, e.g. for stored results
+        return f"bert-base-uncased|google/vit-large-patch16-224|{self.precision}"
+
+    def warm_up(self, modalities=None, background=True):
+        return self.loader.warm_up(modalities, background=background)
+
+    def _load_text_model(self):
+        # Initialize text components
+        self.text_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+        self.text_model = self._load_registered(TextSentimentModel, 'models/text_sentiment_model.pth', 'text')
+
+    def _load_image_model(self):
+        # Initialize image components
+        self.image_processor = ViTFeatureExtractor.from_pretrained('google/vit-large-patch16-224')
+        self.image_model = self._load_registered(ImageSentimentModel, 'models/image_sentiment_model.pth', 'image')
+
+    def _load_registered(self, model_class, weights_path, modality):
+        """Load a sentiment model through the shared registry so workers share its weights."""
+        # Key on the trained weights file so a new checkpoint invalidates the cached copy
+        version = int(os.path.getmtime(weights_path)) if os.path.exists(weights_path) else 'untrained'
+
+        def build():
+            model = model_class()
+            # Load trained weights if available
+            try:
+                model.load_state_dict(torch.load(weights_path, map_location='cpu'))
+            except Exception:
+                print(f"Warning: Pre-trained {modality} model not found. Using content-based sentiment analysis.")
+            return model
+
+        def skeleton():
+            with no_init_weights():
+                return model_class(pretrained=False)
+
+        model = registry.load(f"{model_class.__name__}-{version}", build, skeleton)
+        model.to(self.device)
+        model.eval()
+        return apply_precision(model, self.precision)
+
     def analyze(self, text, image=None):
         # Try to use trained models if available
         try:
             return self.analyze_with_models(text, image)
-        except:
+        except Exception as e:
+            logging.warning(f"Model analysis failed, using content-based analysis: {e}")
             # Fall back to content-based analysis
             return self.analyze_content_based(text, image)
     
+    def analyze_batch(self, texts, batch_size=32):
+        """Analyze a list of texts in padded mini-batches of `batch_size`.
+
+        Each mini-batch runs one BERT forward pass; if it fails, that mini-batch
+        falls back to content-based analysis. Every result carries an `engine` key.
+        """
+        results = [None] * len(texts)
+        indices = []
+        for i, text in enumerate(texts):
+            if text:
+                indices.append(i)
+            else:
+                results[i] = self.analyze_with_models(text)
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            chunk_texts = [texts[i] for i in chunk]
+            try:
+                chunk_results = self.analyze_with_models_batch(chunk_texts)
+            except Exception as e:
+                logging.warning(f"Batched model analysis failed, using content-based analysis: {e}")
+                chunk_results = self.analyze_content_based_batch(chunk_texts)
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+        return results
+
+    def analyze_with_models_batch(self, texts):
+        self.loader.ensure('text')
+        with stage('tokenize'):
+            inputs = self.text_tokenizer(texts, return_tensors='pt', padding=True, truncation=True, max_length=512)
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        with stage('text_forward'), inference_context(self.precision):
+            text_outputs = self.text_model(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask'])
+            batch_probs = F.softmax(text_outputs.float(), dim=1).cpu().numpy()
+        
+        results = []
+        for probs in batch_probs:
+            sentiment_idx = int(np.argmax(probs))
+            results.append({
+                "sentiment": self.sentiment_labels[sentiment_idx],
+                "confidence": float(probs[sentiment_idx]),
+                "distribution": {
+                    self.sentiment_labels[i]: float(probs[i]) for i in range(len(self.sentiment_labels))
+                },
+                "text_used": True,
+                "image_used": False,
+                "engine": "model"
+            })
+        return results
+    
     def analyze_with_models(self, text, image=None):
         # Process text input
         text_probs = None
         if text:
-            inputs = self.text_tokenizer(text, return_tensors='pt', padding=True, truncation=True, max_length=512)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            self.loader.ensure('text')
+            with stage('tokenize'):
+                inputs = self.text_tokenizer(text, return_tensors='pt', padding=True, truncation=True, max_length=512)
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
-            with torch.no_grad():
+            with stage('text_forward'), inference_context(self.precision):
                 text_outputs = self.text_model(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask'])
-                text_probs = F.softmax(text_outputs, dim=1).cpu().numpy()[0]
+                text_probs = F.softmax(text_outputs.float(), dim=1).cpu().numpy()[0]
         
         # Process image input
         image_probs = None
         if image:
-            inputs = self.image_processor(images=image, return_tensors='pt')
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            self.loader.ensure('image')
+            with stage('feature_extraction'):
+                inputs = self.image_processor(images=image, return_tensors='pt')
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
-            with torch.no_grad():
+            with stage('image_forward'), inference_context(self.precision):
                 image_outputs = self.image_model(pixel_values=inputs['pixel_values'])
-                image_probs = F.softmax(image_outputs, dim=1).cpu().numpy()[0]
+                image_probs = F.softmax(image_outputs.float(), dim=1).cpu().numpy()[0]
         
         # Late fusion - average probabilities if both modalities are present
         if text_probs is not None and image_probs is not None:
@@ -137,7 +238,7 @@ class MultimodalSentimentAnalyzer:
         elif image_probs is not None:
             final_probs = image_probs
         else:
-            return {"error": "No input provided"}
+            return {"error": "No input provided", "engine": "model"}
         
         # Get the sentiment with highest probability
         sentiment_idx = np.argmax(final_probs)
@@ -153,92 +254,26 @@ class MultimodalSentimentAnalyzer:
             "confidence": float(final_probs[sentiment_idx]),
             "distribution": sentiment_distribution,
             "text_used": text is not None,
-            "image_used": image is not None
+            "image_used": image is not None,
+            "engine": "model"
         }
     
     def analyze_content_based(self, text, image=None):
         """Analyze sentiment based on text content and keywords"""
-        text_score = 0
-        confidence = 0.7  # Base confidence
-        
-        if text:
-            # Clean and normalize text
-            text = text.lower()
-            text = re.sub(r'[^\w\s\']', ' ', text)  # Keep apostrophes for contractions
-            words = text.split()
-            
-            # Count negation words
-            negation_count = sum(1 for word in words if word in self.negation_words)
-            has_negation = negation_count % 2 == 1  # Odd number of negations flips sentiment
-            
-            # Count sentiment words
-            positive_count = sum(1 for word in words if word in self.positive_words)
-            negative_count = sum(1 for word in words if word in self.negative_words)
-            
-            # Check for emojis
-            positive_emoji_count = sum(1 for char in text if char in self.positive_emojis)
-            negative_emoji_count = sum(1 for char in text if char in self.negative_emojis)
-            
-            # Calculate the sentiment score
-            positive_score = positive_count + positive_emoji_count
-            negative_score = negative_count + negative_emoji_count
-            
-            if has_negation:
-                # Flip the dominant sentiment
-                if positive_score > negative_score:
-                    text_score = -1 * (positive_score - negative_score)
-                else:
-                    text_score = (negative_score - positive_score)
-            else:
-                text_score = positive_score - negative_score
-            
-            # Normalize score to range [-1, 1]
-            total_counts = max(1, positive_count + negative_count + positive_emoji_count + negative_emoji_count)
-            text_score = text_score / total_counts
-            
-            # Higher confidence with more sentiment words
-            if total_counts > 3:
-                confidence = min(0.95, 0.7 + (total_counts - 3) * 0.05)
-        
-        # Determine sentiment
-        if text_score > 0.1:
-            sentiment = "Positive"
-            final_score = text_score
-        elif text_score < -0.1:
-            sentiment = "Negative"
-            final_score = abs(text_score)
-        else:
-            sentiment = "Neutral"
-            final_score = 0.5 - abs(text_score)
-            
-        # Create probability distribution
-        if sentiment == "Positive":
-            distribution = {
-                "Negative": max(0, min(1, 0.1 - text_score * 0.05)),
-                "Neutral": max(0, min(1, 0.3 - text_score * 0.1)),
-                "Positive": max(0, min(1, 0.6 + text_score * 0.4))
-            }
-        elif sentiment == "Negative":
-            distribution = {
-                "Negative": max(0, min(1, 0.6 + abs(text_score) * 0.4)),
-                "Neutral": max(0, min(1, 0.3 - abs(text_score) * 0.1)),
-                "Positive": max(0, min(1, 0.1 - abs(text_score) * 0.05))
-            }
-        else:
-            distribution = {
-                "Negative": max(0, min(1, 0.2 + abs(text_score) * 0.2)),
-                "Neutral": max(0, min(1, 0.6 - abs(text_score) * 0.2)),
-                "Positive": max(0, min(1, 0.2 + text_score * 0.2))
+        return self.analyze_content_based_batch([text], image)[0]
+
+    def analyze_content_based_batch(self, texts, image=None):
+        """Content-based analysis of many texts: one lexicon pass each, vectorized scoring"""
+        with stage('lexicon'):
+            sentiment_idx, confidence, distribution = content_based_scores(self.lexicon.count_batch(texts))
+        return [
+            {
+                "sentiment": self.sentiment_labels[sentiment_idx[i]],
+                "confidence": float(confidence[i]),
+                "distribution": {self.sentiment_labels[j]: float(distribution[i, j]) for j in range(3)},
+                "text_used": text is not None,
+                "image_used": image is not None,
+                "engine": "lexicon"
             }
-            
-        # Normalize distribution to sum to 1
-        total = sum(distribution.values())
-        distribution = {k: v/total for k, v in distribution.items()}
-        
-        return {
-            "sentiment": sentiment,
-            "confidence": confidence,
-            "distribution": distribution,
-            "text_used": text is not None,
-            "image_used": image is not None
-        }
+            for i, text in enumerate(texts)
+        ]
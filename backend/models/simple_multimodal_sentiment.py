@@ -1,6 +1,9 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 import numpy as np
 from PIL import Image
-import re
+from .lexicon import CompiledLexicon, NEGATIVE, POSITIVE
 
 class SimpleMultimodalSentimentAnalyzer:
     def __init__(self):
@@ -11,35 +14,70 @@ class SimpleMultimodalSentimentAnalyzer:
             'bad', 'terrible', 'awful', 'horrible', 'poor', 'disappointing', 'hate', 'dislike', 'sad', 'angry', 'upset', 'unfortunate', 'worst', 'failure', 'fail', 'problem', 'issue', 'trouble', 'hard', 'negative', 'wrong', 'error', 'broken', 'useless', 'waste', 'sorry', 'complaint', 'annoying', 'frustrating', 'unhappy', 'regret', 'disaster', 'critical', 'worried', 'concerned', 'pathetic', 'ridiculous', 'inadequate', 'uncomfortable'
         ])
         self.sentiment_labels = ['Negative', 'Neutral', 'Positive']
+        # Apostrophes split words here, unlike the full analyzer's lexicon
+        self.lexicon = CompiledLexicon(self.positive_words, self.negative_words, word_pattern=r'\w+')
 
     def analyze_text(self, text):
         if not text:
             return np.array([0.333, 0.334, 0.333])
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        words = text.split()
-        pos = sum(1 for w in words if w in self.positive_words)
-        neg = sum(1 for w in words if w in self.negative_words)
-        if pos > neg:
-            return np.array([0.1, 0.2, 0.7])  # Positive
-        elif neg > pos:
-            return np.array([0.7, 0.2, 0.1])  # Negative
-        else:
-            return np.array([0.25, 0.5, 0.25])  # Neutral
+        return self.analyze_text_batch([text])[0]
+
+    def analyze_text_batch(self, texts):
+        """Score many texts into an (N, 3) array; empty texts get the uniform prior."""
+        counts = self.lexicon.count_batch(texts)
+        pos = counts[:, POSITIVE]
+        neg = counts[:, NEGATIVE]
+        probs = np.select(
+            [(pos > neg)[:, None], (neg > pos)[:, None]],
+            [np.array([0.1, 0.2, 0.7]), np.array([0.7, 0.2, 0.1])],  # Positive, Negative
+            np.array([0.25, 0.5, 0.25])  # Neutral
+        )
+        empty = np.array([not text for text in texts], dtype=bool)
+        probs[empty] = [0.333, 0.334, 0.333]
+        return probs
 
     def analyze_image(self, image):
         if not isinstance(image, Image.Image):
             return np.array([0.333, 0.334, 0.333])
+        return self.analyze_image_batch([image])[0]
+
+    def analyze_image_batch(self, images, max_workers=8):
+        """Score many images by brightness into an (N, 3) array.
+
+        Items may be PIL images, encoded image bytes or file paths. Encoded JPEGs
+        are decoded in draft mode straight to a small grayscale image, so the full
+        resolution is never decoded. Decoding runs in a thread pool and brightness
+        is computed for the whole batch at once; undecodable items get the uniform prior.
+        """
+        probs = np.tile(np.array([0.333, 0.334, 0.333]), (len(images), 1))
+        if not images:
+            return probs
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as pool:
+            thumbnails = list(pool.map(self._thumbnail, images))
+        indices = [i for i, thumbnail in enumerate(thumbnails) if thumbnail is not None]
+        if not indices:
+            return probs
         # Simple heuristic: brightness
-        img = image.convert('L').resize((32, 32))
-        arr = np.array(img) / 255.0
-        brightness = arr.mean()
-        if brightness > 0.65:
-            return np.array([0.1, 0.2, 0.7])  # Positive
-        elif brightness < 0.35:
-            return np.array([0.7, 0.2, 0.1])  # Negative
-        else:
-            return np.array([0.25, 0.5, 0.25])  # Neutral
+        brightness = np.stack([thumbnails[i] for i in indices]).mean(axis=(1, 2)) / 255.0
+        probs[indices] = np.select(
+            [(brightness > 0.65)[:, None], (brightness < 0.35)[:, None]],
+            [np.array([0.1, 0.2, 0.7]), np.array([0.7, 0.2, 0.1])],  # Positive, Negative
+            np.array([0.25, 0.5, 0.25])  # Neutral
+        )
+        return probs
+
+    @staticmethod
+    def _thumbnail(image):
+        """Return a 32x32 grayscale uint8 array for an image, or None if it cannot be decoded."""
+        try:
+            if not isinstance(image, Image.Image):
+                image = Image.open(BytesIO(image) if isinstance(image, (bytes, bytearray)) else image)
+                # Let the JPEG decoder downscale by up to 8x and emit grayscale directly
+                image.draft('L', (64, 64))
+            return np.asarray(image.convert('L').resize((32, 32)), dtype=np.uint8)
+        except Exception as e:
+            logging.warning(f"Could not decode image for brightness analysis: {e}")
+            return None
 
     def analyze(self, text=None, image=None):
         import logging
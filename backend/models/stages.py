@@ -0,0 +1,42 @@
+import contextlib
+import threading
+import time
+from torch.profiler import record_function
+
+# Callables taking (stage, seconds), e.g. a metrics histogram
+_observers = []
+_local = threading.local()
+
+
+def add_observer(observer):
+    _observers.append(observer)
+
+
+@contextlib.contextmanager
+def annotate_stages():
+    """Also mark stages on this thread as named ranges for an active torch profiler."""
+    _local.annotate = True
+    try:
+        yield
+    finally:
+        _local.annotate = False
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time one stage of the inference path (tokenization, forward passes, fusion...) for every observer."""
+    annotate = getattr(_local, 'annotate', False)
+    if not _observers and not annotate:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        if annotate:
+            with record_function(name):
+                yield
+        else:
+            yield
+    finally:
+        seconds = time.perf_counter() - start
+        for observer in _observers:
+            observer(name, seconds)
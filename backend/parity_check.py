@@ -0,0 +1,169 @@
+"""Compare a reduced-precision inference mode against fp32 on a fixed local sample.
+
+Usage: python parity_check.py --precision int8 [--analyzer advanced|comments]
+
+The sample is deterministic: --samples texts per length in --text-lengths,
+stitched from the bundled CSV, and as many synthetic images per size in
+--image-sizes. Reports label agreement and probability drift per modality,
+plus median/p95 latency per batch size over --repeats timed passes, as JSON,
+and exits non-zero when label agreement falls below --min-agreement.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tmm2020_twitter_dataset.csv')
+
+
+def load_sample_texts(path=SAMPLE_PATH):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['text'] for row in csv.DictReader(f) if row.get('text')]
+
+
+def make_texts(sample, words, count, offset=0):
+    """`count` distinct texts of about `words` words, stitched from the sample."""
+    pool = ' '.join(sample).split()
+    texts = []
+    for i in range(count):
+        start = ((offset + i) * 7919) % max(1, len(pool) - words)
+        texts.append(' '.join(pool[start:start + words]) + f' #{offset + i}')
+    return texts
+
+
+def make_sample_images(count=8, size=224, seed=0):
+    """Deterministic synthetic images (gradients plus noise) covering dark to bright."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        base = np.linspace(0, 255 * (i + 1) / count, size, dtype=np.float32)
+        channels = [np.add.outer(base, base * rng.uniform(0.2, 1.0)) / 2 for _ in range(3)]
+        pixels = np.stack(channels, axis=-1) + rng.normal(0, 12, (size, size, 3))
+        images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB'))
+    return images
+
+
+def build_analyzer(kind, precision):
+    if kind == 'advanced':
+        from models.advanced_multimodal_sentiment import AdvancedMultimodalSentimentAnalyzer
+        return AdvancedMultimodalSentimentAnalyzer(precision=precision)
+    from models.sentiment_model import MultimodalSentimentAnalyzer
+    return MultimodalSentimentAnalyzer(precision=precision)
+
+
+def modality_fns(analyzer, kind):
+    """(text_fn, image_fn), each mapping one batch to an (N, 3) array of probabilities."""
+    labels = ['Negative', 'Neutral', 'Positive']
+    if kind == 'advanced':
+        return (lambda batch: analyzer.analyze_text_batch(batch, batch_size=len(batch)),
+                lambda batch: analyzer.analyze_image_batch(batch, batch_size=len(batch)))
+
+    def text_fn(batch):
+        return np.array([[r['distribution'][l] for l in labels] for r in analyzer.analyze_with_models_batch(batch)])
+
+    def image_fn(batch):
+        return np.array([[analyzer.analyze_with_models(None, image)['distribution'][l] for l in labels] for image in batch])
+    return text_fn, image_fn
+
+
+def score(fn, items, batch_sizes, repeats):
+    """Return (probs, latencies) for one modality.
+
+    `probs` is an (N, 3) array over all `items`, scored in batches of the
+    largest batch size; `latencies` maps each batch size to (seconds, items)
+    per batch call of `repeats` timed passes over the items.
+    """
+    fn(items[:1])  # load models and warm up kernels outside the timed region
+    largest = max(batch_sizes)
+    probs = np.concatenate([np.asarray(fn(items[i:i + largest]), dtype=np.float64)
+                            for i in range(0, len(items), largest)])
+    latencies = {}
+    for batch_size in batch_sizes:
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        fn(batches[0])
+        timings = []
+        for _ in range(repeats):
+            for batch in batches:
+                start = time.perf_counter()
+                fn(batch)
+                timings.append((time.perf_counter() - start, len(batch)))
+        latencies[batch_size] = timings
+    return probs, latencies
+
+
+def latency_stats(timings):
+    seconds = [elapsed for elapsed, _ in timings]
+    p50, p95 = np.percentile(seconds, [50, 95])
+    return {'p50_ms': round(float(p50) * 1000, 3), 'p95_ms': round(float(p95) * 1000, 3),
+            'items_per_s': round(sum(items for _, items in timings) / sum(seconds), 2) if sum(seconds) else None}
+
+
+def compare(reference, candidate):
+    (ref_probs, ref_latencies), (cand_probs, cand_latencies) = reference, candidate
+    drift = np.abs(ref_probs - cand_probs)
+    latency = {}
+    for batch_size in ref_latencies:
+        fp32 = latency_stats(ref_latencies[batch_size])
+        cand = latency_stats(cand_latencies[batch_size])
+        latency[str(batch_size)] = {
+            'fp32': fp32,
+            'candidate': cand,
+            'p50_speedup': round(fp32['p50_ms'] / cand['p50_ms'], 3) if cand['p50_ms'] else None,
+        }
+    return {
+        'samples': int(len(ref_probs)),
+        'label_agreement': float(np.mean(ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1))),
+        'max_abs_drift': float(drift.max()),
+        'mean_abs_drift': float(drift.mean()),
+        'latency_by_batch_size': latency,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--precision', default='int8', choices=['int8', 'bf16'])
+    parser.add_argument('--analyzer', default='advanced', choices=['advanced', 'comments'])
+    parser.add_argument('--min-agreement', type=float, default=0.95)
+    parser.add_argument('--skip-images', action='store_true', help='Only compare the text model')
+    parser.add_argument('--samples', type=int, default=64, help='Texts per length and images per size')
+    parser.add_argument('--text-lengths', type=lambda s: [int(x) for x in s.split(',')], default=[8, 64, 256])
+    parser.add_argument('--image-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[64, 224, 512])
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[1, 8, 32])
+    parser.add_argument('--repeats', type=int, default=5, help='Timed passes over the sample per batch size')
+    args = parser.parse_args(argv)
+
+    sample = load_sample_texts()
+    texts = [text for words in args.text_lengths
+             for text in make_texts(sample, words, args.samples, offset=words * args.samples)]
+    images = [] if args.skip_images else [
+        image for i, size in enumerate(args.image_sizes) for image in make_sample_images(args.samples, size, seed=i)]
+    reference = build_analyzer(args.analyzer, 'fp32')
+    candidate = build_analyzer(args.analyzer, args.precision)
+    if candidate.precision != args.precision:
+        print(f"{args.precision} is not available on this machine", file=sys.stderr)
+        return 2
+
+    modalities = {'text': texts} if args.skip_images else {'text': texts, 'image': images}
+    ref_fns = dict(zip(('text', 'image'), modality_fns(reference, args.analyzer)))
+    cand_fns = dict(zip(('text', 'image'), modality_fns(candidate, args.analyzer)))
+    report = {
+        'analyzer': args.analyzer,
+        'precision': args.precision,
+        'repeats': args.repeats,
+        'modalities': {
+            m: compare(score(ref_fns[m], items, args.batch_sizes, args.repeats),
+                       score(cand_fns[m], items, args.batch_sizes, args.repeats))
+            for m, items in modalities.items()
+        },
+    }
+    print(json.dumps(report, indent=2))
+    passed = all(r['label_agreement'] >= args.min_agreement for r in report['modalities'].values())
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Modules are imported the way app.py imports them, relative to backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep anything a test records out of the working tree
+os.environ.setdefault('SENTIMENT_STORE_DB', os.path.join(tempfile.mkdtemp(prefix='sentiment-store-'), 'sentiment_store.db'))
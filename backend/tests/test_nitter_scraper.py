@@ -0,0 +1,204 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import pytest
+from utils import nitter_scraper
+from utils.nitter_scraper import FeedEntryCache, NitterFetcher
+
+
+def rss(tag, count=3):
+    items = ''.join(
+        f'<item><title>tweet {tag} {i}</title><link>https://nitter.test/status/{tag}{i}</link>'
+        f'<guid>{tag}{i}</guid><dc:creator>@user{i}</dc:creator>'
+        f'<pubDate>Mon, 01 Jan 2024 00:00:0{i} GMT</pubDate></item>'
+        for i in range(count)
+    )
+    return (
+        '<?xml version="1.0"?><rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f'<channel><title>{tag}</title>{items}</channel></rss>'
+    ).encode()
+
+
+class StandInInstance:
+    """Local stand-in for a Nitter instance; `mode` is 'dead' (503), 'html' (block page) or 'good'.
+
+    With `hang`, every request blocks until `release` is set, then answers according to `mode`.
+    """
+
+    def __init__(self, mode='good', delay=0.0, hang=False):
+        self.mode = mode
+        self.delay = delay
+        self.release = threading.Event()
+        if not hang:
+            self.release.set()
+        self.hits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        instance = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with instance._lock:
+                    instance.hits += 1
+                    instance.in_flight += 1
+                    instance.max_in_flight = max(instance.max_in_flight, instance.in_flight)
+                try:
+                    instance.release.wait()
+                    time.sleep(instance.delay)
+                    if instance.mode == 'dead':
+                        self.send_response(503)
+                        self.end_headers()
+                        return
+                    if instance.mode == 'html':
+                        body, content_type = b'<html><body>Rate limited</body></html>', 'text/html'
+                    else:
+                        body, content_type = rss(unquote(self.path.rsplit('=', 1)[-1]).strip('#/')), 'application/rss+xml'
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with instance._lock:
+                        instance.in_flight -= 1
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def instances():
+    started = []
+
+    def start(mode='good', delay=0.0, hang=False):
+        instance = StandInInstance(mode, delay, hang)
+        started.append(instance)
+        return instance
+
+    yield start
+    for instance in started:
+        instance.close()
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(nitter_scraper, 'DEBUG_MODE', False)
+
+
+def test_hedged_fetch_returns_the_first_good_feed(instances):
+    dead, html, stuck, good = instances('dead'), instances('html'), instances('good', hang=True), instances('good')
+    fetcher = NitterFetcher([dead.url, html.url, stuck.url, good.url], hedge=2, timeout=10.0, deadline=10.0)
+    feed = fetcher.fetch('/search/rss?f=tweets&q=%23tech')
+    assert [entry.title for entry in feed.entries] == ['tweet tech 0', 'tweet tech 1', 'tweet tech 2']
+    # Hedged with the stuck instance, which has not answered yet: the feed came from the good one
+    assert (stuck.hits, good.hits) == (1, 1)
+    assert fetcher.health[stuck.url].latency is None
+    stuck.release.set()
+    status = fetcher.status()
+    assert status[dead.url]['consecutive_failures'] == 1
+    assert status[html.url]['consecutive_failures'] == 1  # a 200 HTML page is not a feed
+    assert status[good.url]['latency_ms'] is not None
+    # The good instance now scores best and is asked first
+    assert fetcher._candidates()[0] == good.url
+
+
+def test_fetch_fails_when_no_instance_serves_a_feed(instances):
+    dead, html = instances('dead'), instances('html')
+    fetcher = NitterFetcher([dead.url, html.url], hedge=2, timeout=1.0, deadline=2.0)
+    with pytest.raises(Exception, match='All Nitter instances failed'):
+        fetcher.fetch('/bob/rss')
+
+
+def test_breaker_opens_and_half_opens_with_a_single_trial(instances):
+    flaky, good = instances('dead'), instances('good')
+    fetcher = NitterFetcher([flaky.url, good.url], hedge=2, timeout=1.0, deadline=3.0)
+    health = fetcher.health[flaky.url]
+    health.base_backoff = 0.3
+    for _ in range(health.failure_threshold):
+        with pytest.raises(Exception):
+            fetcher._request(flaky.url, '/bob/rss', False)
+    assert health.open_until > time.monotonic()
+    assert flaky.url not in fetcher._candidates()
+    hits = flaky.hits
+    fetcher.fetch('/bob/rss')
+    assert flaky.hits == hits  # open breaker: not contacted
+
+    time.sleep(max(0.0, health.open_until - time.monotonic()) + 0.05)
+    assert flaky.url in fetcher._candidates()
+    flaky.mode = 'good'
+    flaky.release.clear()
+    trial = threading.Thread(target=fetcher._request, args=(flaky.url, '/bob/rss', False))
+    trial.start()
+    while flaky.hits == hits:
+        time.sleep(0.01)
+    # Half-open: only the one trial request is allowed through
+    assert health.trial_in_flight
+    assert flaky.url not in fetcher._candidates()
+    flaky.release.set()
+    trial.join()
+    assert health.consecutive_failures == 0
+    assert health.open_until == 0.0
+    assert flaky.url in fetcher._candidates()
+
+
+def test_failed_trial_reopens_with_a_longer_backoff(instances):
+    flaky = instances('dead')
+    fetcher = NitterFetcher([flaky.url], hedge=1, timeout=1.0)
+    health = fetcher.health[flaky.url]
+    health.base_backoff = 0.2
+    for _ in range(health.failure_threshold):
+        with pytest.raises(Exception):
+            fetcher._request(flaky.url, '/bob/rss', False)
+    time.sleep(max(0.0, health.open_until - time.monotonic()) + 0.05)
+    before = time.monotonic()
+    with pytest.raises(Exception):
+        fetcher._request(flaky.url, '/bob/rss', False)
+    after = time.monotonic()
+    # Backoff doubles per failure past the threshold, with +/-20% jitter, from when the trial failed
+    assert before + 0.2 * 2 * 0.8 <= health.open_until <= after + 0.2 * 2 * 1.2
+    assert not health.trial_in_flight
+
+
+def test_fetch_fails_fast_while_every_breaker_is_open(instances):
+    flaky = instances('dead')
+    fetcher = NitterFetcher([flaky.url], hedge=1, timeout=1.0)
+    health = fetcher.health[flaky.url]
+    for _ in range(health.failure_threshold):
+        with pytest.raises(Exception):
+            fetcher._request(flaky.url, '/bob/rss', False)
+    hits = flaky.hits
+    for _ in range(3):
+        with pytest.raises(Exception, match='every circuit breaker is open'):
+            fetcher.fetch('/bob/rss')
+    assert flaky.hits == hits
+
+
+def test_get_random_tweets_fans_hashtags_out_concurrently(instances, monkeypatch):
+    good = instances('good', delay=0.3)
+    monkeypatch.setattr(nitter_scraper, 'fetcher', NitterFetcher([good.url], hedge=1, timeout=2.0, deadline=5.0))
+    monkeypatch.setattr(nitter_scraper, 'feed_cache', FeedEntryCache())
+    tweets = nitter_scraper.get_random_tweets(limit=100)
+    assert good.hits == 10  # one query per hashtag
+    assert len(tweets) == 30
+    assert good.max_in_flight > 1  # queries overlapped instead of running one after another
+
+
+def test_validators_are_kept_for_the_most_recent_feeds_only(instances):
+    good = instances('good')
+    fetcher = NitterFetcher([good.url], hedge=1, timeout=2.0, max_feeds=2)
+    for tag in ('a', 'b', 'c'):
+        fetcher.fetch(f'/search/rss?f=tweets&q=%23{tag}')
+    assert [path for _, path in fetcher.validators] == ['/search/rss?f=tweets&q=%23b', '/search/rss?f=tweets&q=%23c']
+    # An unchanged feed is recognised from its validators and not parsed again
+    assert fetcher.fetch('/search/rss?f=tweets&q=%23c', conditional=True) is nitter_scraper.NOT_MODIFIED
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import prawcore
+import pytest
+from utils.reddit_client_pool import (
+    BACKGROUND, RateLimitBudget, RateLimitShed, RedditClientPool, endpoint_name, request_priority,
+)
+
+
+class FakeReddit:
+    """Local stand-in for Reddit's OAuth API that reports a configurable rate-limit window."""
+
+    def __init__(self, remaining=600, reset=600):
+        self.remaining = remaining
+        self.reset = reset
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body):
+                fake.requests.append((self.command, self.path.split('?')[0]))
+                fake.remaining = max(0, fake.remaining - 1)
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('x-ratelimit-remaining', str(fake.remaining))
+                self.send_header('x-ratelimit-used', '1')
+                self.send_header('x-ratelimit-reset', str(fake.reset))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._send({'access_token': 'token', 'token_type': 'bearer', 'expires_in': 3600, 'scope': '*'})
+
+            def do_GET(self):
+                posts = [{'kind': 't3', 'data': {'id': f'p{i}', 'name': f't3_p{i}', 'title': f'Post {i}',
+                                                 'selftext': '', 'author': f'user{i}', 'subreddit': 'news',
+                                                 'created_utc': 1700000000 + i}} for i in range(3)]
+                self._send({'kind': 'Listing', 'data': {'after': None, 'before': None, 'children': posts}})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def listing_requests(self):
+        return [path for method, path in self.requests if method == 'GET']
+
+
+@pytest.fixture
+def fake_reddit(monkeypatch):
+    fake = FakeReddit()
+    monkeypatch.setenv('REDDIT_CLIENT_ID', 'client')
+    monkeypatch.setenv('REDDIT_CLIENT_SECRET', 'secret')
+    monkeypatch.setenv('REDDIT_OAUTH_URL', fake.url)
+    monkeypatch.setenv('REDDIT_URL', fake.url)
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+def make_pool(background_reserve=10, max_wait=5.0):
+    return RedditClientPool(size=2, budget=RateLimitBudget(background_reserve=background_reserve, max_wait=max_wait))
+
+
+def fetch_new(pool, subreddit='news'):
+    return [post.id for post in pool.get().subreddit(subreddit).new(limit=3)]
+
+
+def test_budget_follows_rate_limit_headers(fake_reddit):
+    fake_reddit.remaining, fake_reddit.reset = 500, 120
+    pool = make_pool()
+    assert fetch_new(pool) == ['p0', 'p1', 'p2']
+    stats = pool.budget.stats()
+    assert stats['remaining'] == fake_reddit.remaining
+    assert 0 < stats['reset_in'] <= 120
+
+
+def test_background_requests_are_shed_at_the_reserve(fake_reddit):
+    fake_reddit.remaining, fake_reddit.reset = 12, 1
+    pool = make_pool(background_reserve=10)
+    fetch_new(pool)  # token request plus listing leave 10 in the window
+    sent = len(fake_reddit.requests)
+    with request_priority(BACKGROUND):
+        with pytest.raises(prawcore.exceptions.RequestException) as excinfo:
+            fetch_new(pool)
+    assert isinstance(excinfo.value.original_exception, RateLimitShed)
+    assert len(fake_reddit.requests) == sent  # never reached the server
+    assert pool.budget.stats()['shed'][BACKGROUND] == 1
+    # Interactive traffic may still use the reserve
+    assert fetch_new(pool) == ['p0', 'p1', 'p2']
+
+
+def test_interactive_requests_wait_for_the_window_to_reset(fake_reddit):
+    fake_reddit.remaining, fake_reddit.reset = 2, 1
+    pool = make_pool(max_wait=5.0)
+    fetch_new(pool)  # exhausts the window
+    assert pool.budget.stats()['remaining'] == 0
+    start = time.monotonic()
+    assert fetch_new(pool) == ['p0', 'p1', 'p2']
+    assert time.monotonic() - start >= 0.5
+    assert pool.budget.stats()['waited_seconds'] > 0
+
+
+def test_interactive_requests_are_shed_after_max_wait(fake_reddit):
+    fake_reddit.remaining, fake_reddit.reset = 2, 60
+    pool = make_pool(max_wait=0.2)
+    fetch_new(pool)
+    with pytest.raises(prawcore.exceptions.RequestException):
+        fetch_new(pool)
+    assert pool.budget.stats()['shed']['interactive'] == 1
+
+
+def test_per_endpoint_accounting(fake_reddit):
+    pool = make_pool()
+    fetch_new(pool, 'news')
+    fetch_new(pool, 'pics')
+    next(pool.get().subreddit('news').hot(limit=3))
+    endpoints = pool.stats()['endpoints']
+    assert endpoints['GET /r/{}/new']['calls'] == 2
+    assert endpoints['GET /r/{}/hot']['calls'] == 1
+    assert endpoints['POST /api/v1/access_token']['calls'] >= 1
+    assert all(stats['errors'] == 0 and stats['avg_ms'] >= 0 for stats in endpoints.values())
+    assert len(fake_reddit.listing_requests()) == 3
+
+
+def test_endpoint_name_templates_ids():
+    assert endpoint_name('get', 'https://oauth.reddit.com/r/news/comments/abc123/?limit=5') == 'GET /r/{}/comments/{}'
+    assert endpoint_name('get', 'https://oauth.reddit.com/user/bob/submitted') == 'GET /user/{}/submitted'
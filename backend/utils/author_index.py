@@ -0,0 +1,90 @@
+import bisect
+import heapq
+import os
+import threading
+
+_IGNORED = {'', 'none', '[deleted]', 'automoderator'}
+
+
+class AuthorIndex:
+    """In-memory author lookup fed by every post and comment author the backend sees.
+
+    Lowercased names are kept in a sorted array, so a prefix lookup is one
+    binary search. Names are also indexed by character trigrams for substring
+    matches. Each name counts how often it was seen; once the index grows past
+    `max_authors` (plus 10% slack) the least frequently seen names are evicted.
+    """
+
+    def __init__(self, max_authors=100000, ngram=3):
+        self.max_authors = max_authors
+        self.ngram = ngram
+        self._names = []  # sorted lowercased names
+        self._display = {}  # lowercased name -> name as seen
+        self._counts = {}
+        self._grams = {}  # trigram -> set of lowercased names
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _ngrams(self, key):
+        return {key[i:i + self.ngram] for i in range(len(key) - self.ngram + 1)}
+
+    def add(self, authors):
+        """Record one sighting of each author name in `authors`."""
+        with self._lock:
+            for author in authors:
+                name = str(author) if author else ''
+                key = name.lower()
+                if key in _IGNORED:
+                    continue
+                if key in self._counts:
+                    self._counts[key] += 1
+                    continue
+                self._counts[key] = 1
+                self._display[key] = name
+                bisect.insort(self._names, key)
+                for gram in self._ngrams(key):
+                    self._grams.setdefault(gram, set()).add(key)
+            if len(self._counts) > self.max_authors * 1.1:
+                self._evict()
+
+    def _evict(self):
+        # Caller holds the lock; drop the least seen names in one pass to amortize the rebuild
+        by_count = sorted(self._counts, key=self._counts.get)
+        evicted = set(by_count[:len(by_count) - self.max_authors])
+        for key in evicted:
+            del self._counts[key]
+            del self._display[key]
+            for gram in self._ngrams(key):
+                names = self._grams[gram]
+                names.discard(key)
+                if not names:
+                    del self._grams[gram]
+        self._names = [key for key in self._names if key not in evicted]
+        self.evictions += len(evicted)
+
+    def search(self, query, limit=10):
+        """Return up to `limit` names: exact match, then prefix, then substring matches, most seen first."""
+        query = query.strip().lower()
+        if not query:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._names, query)
+            end = bisect.bisect_left(self._names, query + '\uffff', lo=start)
+            ranked = heapq.nsmallest(limit, self._names[start:end], key=lambda key: (key != query, -self._counts[key], key))
+            if len(ranked) < limit and len(query) >= self.ngram:
+                grams = sorted(self._ngrams(query), key=lambda g: len(self._grams.get(g, ())))
+                candidates = set(self._grams.get(grams[0], ()))
+                for gram in grams[1:]:
+                    if not candidates:
+                        break
+                    candidates &= self._grams.get(gram, set())
+                substring = [key for key in candidates if query in key and not key.startswith(query)]
+                ranked += heapq.nsmallest(limit - len(ranked), substring, key=lambda key: (-self._counts[key], key))
+            return [self._display[key] for key in ranked]
+
+    def stats(self):
+        with self._lock:
+            return {'authors': len(self._counts), 'ngrams': len(self._grams), 'evictions': self.evictions}
+
+
+author_index = AuthorIndex(max_authors=int(os.environ.get('AUTHOR_INDEX_MAX', 100000)))
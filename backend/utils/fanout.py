@@ -0,0 +1,65 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class FanOutExecutor:
+    """Runs independent source fetches concurrently under a global deadline.
+
+    `run` keeps at most `concurrency` fetches in flight per call (on a shared,
+    bounded thread pool), returns whatever finished by the deadline, and stops
+    launching new fetches as soon as `stop_when` says it has enough. Each
+    source gets a status: ok, error, timeout, cancelled (not needed) or skipped.
+    """
+
+    def __init__(self, max_workers=8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fanout')
+
+    def run(self, tasks, deadline=8.0, concurrency=4, stop_when=None):
+        """Run `tasks`, a list of (name, callable) pairs.
+
+        Returns (results, statuses): results is a list of (name, value) in
+        completion order, statuses maps each name to its status dict.
+        """
+        start = time.monotonic()
+        end = start + deadline
+        queued = list(tasks)
+        queued.reverse()
+        statuses = {name: {'status': 'skipped'} for name, _ in tasks}
+        results = []
+        running = {}
+        enough = False
+
+        def launch():
+            while queued and len(running) < concurrency and not enough:
+                name, fn = queued.pop()
+                running[self._pool.submit(fn)] = (name, time.monotonic())
+
+        launch()
+        while running:
+            done, _ = wait(list(running), timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                name, started = running.pop(future)
+                elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+                try:
+                    results.append((name, future.result()))
+                    statuses[name] = {'status': 'ok', 'elapsed_ms': elapsed_ms}
+                except Exception as e:
+                    logging.warning(f"Fan-out source {name} failed: {e}")
+                    statuses[name] = {'status': 'error', 'elapsed_ms': elapsed_ms, 'error': str(e)}
+            if stop_when is not None and stop_when([value for _, value in results]):
+                enough = True
+                break
+            launch()
+
+        # Whatever is still outstanding is abandoned: queued work is cancelled, running work is ignored
+        for future, (name, started) in running.items():
+            future.cancel()
+            statuses[name] = {'status': 'cancelled' if enough else 'timeout',
+                              'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+        if not enough:
+            for name, _ in queued:
+                statuses[name] = {'status': 'timeout'}
+        return results, statuses
@@ -0,0 +1,73 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from .metrics import metrics
+
+
+class InferenceBatcher:
+    """Collects concurrent analyze requests into micro-batches.
+
+    Requests submitted within `max_wait_ms` of the first queued request (up to
+    `max_batch_size` of them) share one padded text forward pass and one image
+    forward pass. Each caller gets back exactly what `analyzer.analyze` would
+    have returned for its own inputs.
+    """
+
+    def __init__(self, analyzer, max_batch_size=16, max_wait_ms=5):
+        self.analyzer = analyzer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._worker.start()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, text=None, image=None):
+        """Queue one request and return a Future resolving to its result dict."""
+        future = Future()
+        self._queue.put((text, image, future, time.perf_counter()))
+        return future
+
+    def analyze(self, text=None, image=None, timeout=None):
+        return self.submit(text, image).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logging.exception("Inference batch failed: %s", e)
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        texts = [text for text, _, _, _ in batch]
+        images = [image for _, image, _, _ in batch]
+        logging.debug("Running inference batch of %d", len(batch))
+        started = time.perf_counter()
+        for _, _, _, enqueued in batch:
+            metrics.observe('sentiment_stage_seconds', started - enqueued, stage='batch_queue_wait')
+        metrics.observe('sentiment_batch_size', len(batch))
+        results = self.analyzer.analyze_batch(texts, images, batch_size=self.max_batch_size)
+        for (_, _, future, _), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,265 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import requests
+from PIL import Image
+from .nitter_scraper import get_tweets_by_hashtag
+from .post_index import post_index
+from .reddit_client_pool import BACKGROUND, request_priority
+from .reddit_scraper import get_posts_from_subreddit, iter_post_and_comments
+from .result_sink import record_results
+
+
+class ActivityGate:
+    """Counts interactive requests in flight so background work can yield to them."""
+
+    def __init__(self):
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            self.active += 1
+
+    def exit(self):
+        with self._cond:
+            self.active -= 1
+            if not self.active:
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until no interactive request is running; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.active, timeout=timeout)
+
+
+activity = ActivityGate()
+
+
+def parse_sources(spec):
+    """Parse "news:3,worldnews,pics:0.5" into [(name, priority), ...]; priority defaults to 1."""
+    sources = []
+    for part in spec.split(','):
+        name, _, priority = part.strip().partition(':')
+        if name:
+            sources.append((name, float(priority) if priority else 1.0))
+    return sources
+
+
+class IngestionScheduler:
+    """Background worker that pre-scores hot subreddits and Nitter hashtag feeds.
+
+    Each source is polled every `interval / priority` seconds, with +/- `jitter`
+    randomization so polls do not line up; when several are due the higher
+    priority runs first. New posts are scored in small batches, and before
+    every batch the worker waits, however long it takes, until no interactive
+    request is in flight, so user traffic always pre-empts it. Reddit calls
+    are tagged as background and are the first to be shed when the rate-limit
+    budget runs low.
+
+    Post and tweet results are written to the result cache (under the same key
+    /api/analyze computes), the sentiment store and the trending aggregates;
+    posts still in the hot listing and tweets still among the latest of
+    their feed are re-scored before their cache entries expire. Comments of the busiest posts are scored with `comment_analyzer`.
+    """
+
+    def __init__(self, analyzer, result_cache, comment_analyzer=None, subreddits=(), hashtags=(), interval=300.0,
+                 jitter=0.2, post_limit=25, comment_posts=3, comment_limit=100, batch_size=8, idle_timeout=30.0):
+        self.analyzer = analyzer
+        self.result_cache = result_cache
+        self.comment_analyzer = comment_analyzer
+        self.interval = interval
+        self.jitter = jitter
+        self.post_limit = post_limit
+        self.comment_posts = comment_posts
+        self.comment_limit = comment_limit
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.sources = [('subreddit', name, priority) for name, priority in subreddits]
+        self.sources += [('hashtag', name, priority) for name, priority in hashtags]
+        self._scored = OrderedDict()  # ids already scored with the current model
+        self._images = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ingest-images')
+        self._stop = threading.Event()
+        self._thread = None
+        self.runs = 0
+        self.errors = 0
+        self.scored = {'post': 0, 'comment': 0, 'tweet': 0}
+        self.yield_seconds = 0.0
+        self.last_run = {}
+
+    def start(self):
+        if not self.sources or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='ingestion', daemon=True)
+        self._thread.start()
+        logging.info(f"Background ingestion started for {len(self.sources)} sources")
+
+    def stop(self):
+        self._stop.set()
+
+    def _next_delay(self, priority):
+        base = self.interval / max(priority, 0.01)
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        # Stagger the first round over one jittered interval instead of polling everything at startup
+        now = time.monotonic()
+        due = [(now + random.uniform(0, self.jitter * self.interval), -priority, kind, name)
+               for kind, name, priority in self.sources]
+        heapq.heapify(due)
+        while not self._stop.is_set():
+            run_at, neg_priority, kind, name = due[0]
+            if self._stop.wait(max(0.0, run_at - time.monotonic())):
+                return
+            heapq.heappop(due)
+            try:
+                if kind == 'subreddit':
+                    self.ingest_subreddit(name)
+                else:
+                    self.ingest_hashtag(name)
+                self.runs += 1
+            except Exception as e:
+                self.errors += 1
+                logging.warning(f"Background ingestion of {kind} {name} failed: {e}")
+            self.last_run[f'{kind}:{name}'] = time.time()
+            heapq.heappush(due, (time.monotonic() + self._next_delay(-neg_priority), neg_priority, kind, name))
+
+    def _yield_to_interactive(self):
+        """Wait for a moment with no interactive request in flight; False if the scheduler is stopping."""
+        start = time.monotonic()
+        # Re-check every idle_timeout so stop() is noticed under sustained traffic
+        while not activity.wait_idle(self.idle_timeout):
+            if self._stop.is_set():
+                break
+        self.yield_seconds += time.monotonic() - start
+        return not self._stop.is_set()
+
+    def _unscored(self, kind, items, id_key, rescore_after=None):
+        """Items not scored yet, or (with `rescore_after`) scored longer ago than that many seconds."""
+        model_id = getattr(self.analyzer, 'model_id', '')
+        now = time.monotonic()
+        fresh = []
+        for item in items:
+            scored_at = self._scored.get((kind, item.get(id_key), model_id))
+            if scored_at is None or (rescore_after is not None and now - scored_at >= rescore_after):
+                fresh.append(item)
+        return fresh
+
+    def _mark_scored(self, kind, items, id_key):
+        # Only once results are stored, so a batch abandoned on stop() is picked up again
+        model_id = getattr(self.analyzer, 'model_id', '')
+        now = time.monotonic()
+        for item in items:
+            key = (kind, item.get(id_key), model_id)
+            self._scored[key] = now
+            self._scored.move_to_end(key)
+        while len(self._scored) > 100000:
+            self._scored.popitem(last=False)
+
+    def _cache_refresh_age(self):
+        # Re-score posts and tweets shortly before their result-cache entries expire, so hot items stay cached
+        ttl = getattr(self.result_cache, 'ttl', None)
+        return ttl * 0.9 if ttl else None
+
+    def ingest_subreddit(self, subreddit):
+        with request_priority(BACKGROUND):
+            posts = get_posts_from_subreddit(subreddit, self.post_limit, avatars=False)
+        for start in range(0, len(posts), self.batch_size):
+            batch = self._unscored('post', posts[start:start + self.batch_size], 'post_id', self._cache_refresh_age())
+            if batch:
+                self._score_posts(batch)
+        if self.comment_analyzer is not None and self.comment_posts:
+            busiest = sorted(posts, key=lambda post: -(post.get('num_comments') or 0))[:self.comment_posts]
+            for post in busiest:
+                self._score_comments(post)
+
+    def _score_posts(self, posts):
+        # Score the same text and first image the frontend sends to /api/analyze, so its cache key matches
+        texts = [post['text'] if post.get('text') and post['text'].strip() else (post.get('title') or '') for post in posts]
+        image_bytes = list(self._images.map(_download, [post['images'][0] if post.get('images') else None for post in posts]))
+        images = [_decode(data) for data in image_bytes]
+        if not self._yield_to_interactive():
+            return
+        results = self.analyzer.analyze_batch(texts, images, batch_size=self.batch_size)
+        model_id = self.analyzer.model_id
+        for post, text, data, result in zip(posts, texts, image_bytes, results):
+            self.result_cache.set(self.result_cache.make_key(text, data, model_id), result)
+            post_index.set_sentiment(post['post_id'], result.get('sentiment'))
+        record_results(posts, results, 'post', model_id)
+        self._mark_scored('post', posts, 'post_id')
+        self.scored['post'] += len(posts)
+
+    def _score_comments(self, post):
+        comments = []
+        with request_priority(BACKGROUND):
+            for kind, payload in iter_post_and_comments(post['post_id'], chunk_size=self.comment_limit):
+                if kind == 'comments':
+                    comments.extend(payload)
+                    if len(comments) >= self.comment_limit:
+                        break
+        comments = self._unscored('comment', comments[:self.comment_limit], 'id')
+        items = [{**comment, 'subreddit': post.get('subreddit'), 'parent_id': post['post_id']} for comment in comments]
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            if not self._yield_to_interactive():
+                return
+            results = self.comment_analyzer.analyze_batch([item['text'] for item in batch], batch_size=self.batch_size)
+            record_results(batch, results, 'comment', self.comment_analyzer.model_id)
+            self._mark_scored('comment', batch, 'id')
+            self.scored['comment'] += len(batch)
+
+    def ingest_hashtag(self, hashtag):
+        # Tweets not handed to ingestion before, plus the latest ones again so those still in the feed get re-scored
+        fetched = get_tweets_by_hashtag(hashtag, limit=self.post_limit, new_only=True, consumer='ingestion')
+        fetched += get_tweets_by_hashtag(hashtag, limit=self.post_limit)
+        tweets = list({tweet['tweet_id']: {**tweet, 'hashtag': hashtag} for tweet in fetched}.values())
+        tweets = self._unscored('tweet', tweets, 'tweet_id', self._cache_refresh_age())
+        model_id = self.analyzer.model_id
+        for start in range(0, len(tweets), self.batch_size):
+            batch = tweets[start:start + self.batch_size]
+            if not self._yield_to_interactive():
+                return
+            results = self.analyzer.analyze_batch([tweet['text'] for tweet in batch], None, batch_size=self.batch_size)
+            for tweet, result in zip(batch, results):
+                self.result_cache.set(self.result_cache.make_key(tweet['text'], None, model_id), result)
+            record_results(batch, results, 'tweet', model_id, source='nitter')
+            self._mark_scored('tweet', batch, 'tweet_id')
+            self.scored['tweet'] += len(batch)
+
+    def stats(self):
+        return {
+            'sources': [f'{kind}:{name}' for kind, name, _ in self.sources],
+            'running': self._thread is not None and self._thread.is_alive(),
+            'runs': self.runs,
+            'errors': self.errors,
+            'scored': dict(self.scored),
+            'yield_seconds': round(self.yield_seconds, 3),
+            'active_requests': activity.active,
+            'last_run': dict(self.last_run),
+        }
+
+
+def _download(url):
+    if not url:
+        return None
+    try:
+        resp = requests.get(url, timeout=10)
+        resp.raise_for_status()
+        return resp.content
+    except Exception as e:
+        logging.debug(f"Failed to fetch image {url} for ingestion: {e}")
+        return None
+
+
+def _decode(data):
+    if not data:
+        return None
+    try:
+        return Image.open(BytesIO(data)).convert('RGB')
+    except Exception:
+        return None
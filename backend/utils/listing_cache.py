@@ -0,0 +1,155 @@
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+
+class ListingCache:
+    """In-memory TTL cache with stale-while-revalidate for upstream listings.
+
+    Entries younger than `ttl` are served as-is. Entries up to `stale_ttl`
+    seconds past that are still served, but trigger one background refresh.
+    Older or missing entries are fetched synchronously; concurrent misses for
+    the same key share a single upstream fetch. Background fetches run on the
+    cache's own pool of `refresh_workers` threads, so one cache's refreshes
+    never queue behind another's.
+    """
+
+    def __init__(self, ttl=60, stale_ttl=600, max_entries=1024, refresh_workers=4, name='listing'):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f'{name}-refresh')
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def get_or_fetch(self, key, fetch):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    self._start_refresh(key, fetch)
+                    return value
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+        self._fetch_into(key, fetch, future)
+        return future.result()
+
+    def get_nowait(self, key, fetch, default=None):
+        """Return the cached value (even if stale) or `default`, refreshing in the background."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+            self._start_refresh(key, fetch)
+            return entry[0] if entry is not None else default
+
+    def get_many(self, keys, fetch, timeout, default=None):
+        """Return {key: value} for `keys`, fetching misses concurrently with `fetch(key)`.
+
+        Waits at most `timeout` seconds for the misses; those still in flight get
+        `default` this time and are cached when their fetch completes.
+        """
+        values = {}
+        pending = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    self._start_refresh(key, functools.partial(fetch, key))
+                    pending[key] = self._inflight[key]
+                    continue
+                values[key] = entry[0]
+                self._entries.move_to_end(key)
+                if now - entry[1] < self.ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self._start_refresh(key, functools.partial(fetch, key))
+        if pending:
+            wait(pending.values(), timeout=timeout)
+        for key, future in pending.items():
+            values[key] = future.result() if future.done() and future.exception() is None else default
+        return values
+
+    def _start_refresh(self, key, fetch):
+        # Caller holds the lock; at most one fetch per key is in flight
+        if key in self._inflight:
+            return
+        future = Future()
+        self._inflight[key] = future
+        self._refresh_pool.submit(self._fetch_into, key, fetch, future)
+
+    def _fetch_into(self, key, fetch, future):
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.refresh_errors += 1
+            logging.warning(f"Failed to fetch {key}: {e}")
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refresh_errors': self.refresh_errors,
+            }
+
+
+# Subreddit/user listings: short TTL, served stale while a refresh runs
+listing_cache = ListingCache(
+    ttl=float(os.environ.get('LISTING_CACHE_TTL', 60)),
+    stale_ttl=float(os.environ.get('LISTING_CACHE_STALE', 600)),
+)
+# Author avatars rarely change, so keep them much longer
+avatar_cache = ListingCache(
+    ttl=float(os.environ.get('AVATAR_CACHE_TTL', 86400)),
+    stale_ttl=float(os.environ.get('AVATAR_CACHE_STALE', 7 * 86400)),
+    max_entries=50000,
+    refresh_workers=int(os.environ.get('AVATAR_FETCH_WORKERS', 8)),
+    name='avatar',
+)
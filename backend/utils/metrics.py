@@ -0,0 +1,100 @@
+import bisect
+import threading
+from models.stages import add_observer
+
+# Seconds; fine-grained at the low end where tokenization and fusion live
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Histograms recorded in-process plus gauges and counters read on scrape, rendered as Prometheus text."""
+
+    def __init__(self):
+        self._histograms = {}  # name -> (help, buckets, {labels: Histogram})
+        self._samples = {}  # name -> (type, help, callable returning a number or {labels tuple: number})
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            self._histograms.setdefault(name, (help_text, tuple(buckets), {}))
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, buckets, series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauge(self, name, help_text, read):
+        """Register a gauge; `read()` returns a value, or a dict mapping label tuples to values."""
+        self._samples[name] = ('gauge', help_text, read)
+
+    def counter(self, name, help_text, read):
+        """Register a monotonic total kept elsewhere (e.g. cache hits), read like a gauge; `name` ends in _total."""
+        if not name.endswith('_total'):
+            raise ValueError(f"counter name {name!r} must end in _total")
+        self._samples[name] = ('counter', help_text, read)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = [
+                (name, help_text, buckets, [(key, list(h.counts), h.sum, h.count) for key, h in series.items()])
+                for name, (help_text, buckets, series) in self._histograms.items()
+            ]
+        for name, help_text, buckets, series in histograms:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, counts, total, count in series:
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_labels(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(key)} {total}')
+                lines.append(f'{name}_count{_labels(key)} {count}')
+        for name, (metric_type, help_text, read) in self._samples.items():
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            values = value.items() if isinstance(value, dict) else [((), value)]
+            for key, sample in values:
+                if sample is not None:
+                    lines.append(f'{name}{_labels(key)} {float(sample)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.histogram('sentiment_stage_seconds', 'Time spent per stage of the inference path')
+metrics.histogram('http_request_duration_seconds', 'Request latency per endpoint')
+metrics.histogram('sentiment_batch_size', 'Requests per micro-batched forward pass', buckets=(1, 2, 4, 8, 16, 32, 64))
+add_observer(lambda stage, seconds: metrics.observe('sentiment_stage_seconds', seconds, stage=stage))
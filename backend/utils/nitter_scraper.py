@@ -1,7 +1,15 @@
+import functools
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
 import feedparser
-import itertools
 import json
+from .fanout import FanOutExecutor
 
 # Enable debug logging
 DEBUG_MODE = True
@@ -10,7 +18,7 @@ def debug_log(message):
     if DEBUG_MODE:
         print(f"[DEBUG] {message}")
 
-# List of public Nitter instances for rotation
+# List of public Nitter instances (NITTER_INSTANCES overrides it with a comma-separated list)
 NITTER_INSTANCES = [
     "https://xcancel.com/",
     "https://nitter.net",
@@ -21,27 +29,275 @@ NITTER_INSTANCES = [
     "https://nitter.pussthecat.org",
     "https://nitter.unixfox.eu",
 ]
+if os.environ.get('NITTER_INSTANCES'):
+    NITTER_INSTANCES = [url.strip() for url in os.environ['NITTER_INSTANCES'].split(',') if url.strip()]
+# Feeds whose entries and conditional-request validators are kept
+NITTER_MAX_FEEDS = int(os.environ.get('NITTER_MAX_FEEDS', 512))
 
-nitter_cycle = itertools.cycle(NITTER_INSTANCES)
 
-def fetch_from_nitter(path, limit=10):
-    """Try all Nitter instances in rotation until one succeeds."""
-    errors = []
-    for _ in range(len(NITTER_INSTANCES)):
-        base_url = next(nitter_cycle)
-        url = f"{base_url}{path}"
+class InstanceHealth:
+    """Moving health score of one Nitter instance with a circuit breaker.
+
+    Latency and success rate are exponentially weighted moving averages.
+    After `failure_threshold` consecutive failures the breaker opens for an
+    exponentially growing, jittered backoff; once that expires the instance
+    gets one trial request (half-open) and is closed again on success.
+    """
+
+    def __init__(self, alpha=0.3, failure_threshold=3, base_backoff=30.0, max_backoff=900.0):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.latency = None
+        self.success_rate = 1.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    def available(self, now):
+        return now >= self.open_until and not self.trial_in_flight
+
+    def score(self):
+        # Expected seconds per good response; unknown instances look average so they get tried
+        latency = self.latency if self.latency is not None else 1.0
+        return latency / max(self.success_rate, 0.05)
+
+    def record(self, ok, seconds):
+        a = self.alpha
+        self.success_rate = (1 - a) * self.success_rate + a * (1.0 if ok else 0.0)
+        self.trial_in_flight = False
+        if ok:
+            self.latency = seconds if self.latency is None else (1 - a) * self.latency + a * seconds
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_failures - self.failure_threshold))
+            self.open_until = time.monotonic() + backoff * random.uniform(0.8, 1.2)
+
+    def status(self, now):
+        return {
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'success_rate': round(self.success_rate, 3),
+            'consecutive_failures': self.consecutive_failures,
+            'open_for': round(max(0.0, self.open_until - now), 1),
+        }
+
+
+# Returned by NitterFetcher.fetch when the feed has not changed since it was last fetched
+NOT_MODIFIED = None
+
+
+class FeedEntryCache:
+    """Parsed entries of recently fetched feeds, plus which of them each consumer has been given.
+
+    `update` stores a freshly parsed feed. `take_unseen` hands a consumer (e.g.
+    background ingestion) the entries it has not taken before and marks only
+    those as seen, so entries past its limit are still returned next time, and
+    interactive reads of the same feed do not hide anything from it. Each
+    (consumer, feed) remembers at most `max_seen` tweet ids; the least recently
+    used feeds are dropped past `max_feeds`.
+    """
+
+    def __init__(self, max_feeds=512, max_seen=1000):
+        self.max_feeds = max_feeds
+        self.max_seen = max_seen
+        self._feeds = OrderedDict()  # path -> latest entries
+        self._seen = OrderedDict()  # (consumer, path) -> OrderedDict of tweet ids taken
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def entry_id(entry):
+        return entry.get("id", entry.get("link", ""))
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._feeds
+
+    def entries(self, path):
+        with self._lock:
+            entries = self._feeds.get(path)
+            if entries is None:
+                return []
+            self._feeds.move_to_end(path)
+            return list(entries)
+
+    def update(self, path, entries):
+        with self._lock:
+            self._feeds.pop(path, None)
+            self._feeds[path] = list(entries)
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+
+    def take_unseen(self, path, consumer, limit):
+        """Up to `limit` entries of `path` that `consumer` has not taken yet, marked as taken."""
+        with self._lock:
+            seen = self._seen.pop((consumer, path), None) or OrderedDict()
+            self._seen[(consumer, path)] = seen
+            while len(self._seen) > self.max_feeds:
+                self._seen.popitem(last=False)
+            taken = []
+            for entry in self._feeds.get(path, ()):
+                if len(taken) >= limit:
+                    break
+                tweet_id = self.entry_id(entry)
+                if tweet_id not in seen:
+                    taken.append(entry)
+                    seen[tweet_id] = True
+            while len(seen) > self.max_seen:
+                seen.popitem(last=False)
+            return taken
+
+
+class NitterFetcher:
+    """Fetches a Nitter RSS path with hedged requests across the healthiest instances.
+
+    The `hedge` best-scoring available instances are requested concurrently and
+    the first response that parses as a feed wins; if they all fail, the next
+    `hedge` instances are tried, until `deadline` seconds have passed. Slower
+    requests still finish in the background and update their instance's health.
+    Conditional-request validators are kept for the `max_feeds` most recently
+    fetched paths per instance.
+    """
+
+    def __init__(self, instances, hedge=2, timeout=5.0, deadline=12.0, max_workers=16, max_feeds=512):
+        self.instances = list(instances)
+        self.hedge = hedge
+        self.timeout = timeout
+        self.deadline = deadline
+        self.health = {instance: InstanceHealth() for instance in self.instances}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=len(self.instances), pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nitter')
+        self._lock = threading.Lock()
+        self.validators = OrderedDict()  # (instance, path) -> ETag / Last-Modified / body digest of the last feed
+        self.max_validators = max_feeds * max(1, len(self.instances))
+        self.not_modified = 0
+
+    def _candidates(self):
+        now = time.monotonic()
+        with self._lock:
+            # With every breaker open this is empty and fetch() fails fast until the first one half-opens
+            available = [i for i in self.instances if self.health[i].available(now)]
+            return sorted(available, key=lambda i: self.health[i].score())
+
+    def _request(self, base_url, path, conditional):
+        with self._lock:
+            health = self.health[base_url]
+            if time.monotonic() >= health.open_until and health.consecutive_failures >= health.failure_threshold:
+                health.trial_in_flight = True
+            validators = {}
+            if conditional and (base_url, path) in self.validators:
+                self.validators.move_to_end((base_url, path))
+                validators = self.validators[(base_url, path)]
+        url = f"{base_url.rstrip('/')}{path}"
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        start = time.monotonic()
         try:
             debug_log(f"Trying Nitter instance: {url}")
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            feed = feedparser.parse(response.content)
-            return feed.entries[:limit]
-        except Exception as e:
-            debug_log(f"Nitter instance failed: {base_url} ({str(e)})")
-            errors.append((base_url, str(e)))
-            continue
-    debug_log(f"All Nitter instances failed: {errors}")
-    raise Exception("All Nitter instances failed")
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                feed = NOT_MODIFIED
+            else:
+                response.raise_for_status()
+                digest = hashlib.sha1(response.content).digest()
+                if digest == validators.get('digest'):
+                    # Instances without validators often resend an identical feed; skip re-parsing it
+                    feed = NOT_MODIFIED
+                else:
+                    feed = feedparser.parse(response.content)
+                    # Blocked or rate-limited instances often answer 200 with an HTML page
+                    if not feed.version or (feed.bozo and not feed.entries):
+                        raise ValueError(f"not a valid feed: {feed.get('bozo_exception', 'unknown format')}")
+                    with self._lock:
+                        self.validators.pop((base_url, path), None)
+                        self.validators[(base_url, path)] = {
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified'),
+                            'digest': digest,
+                        }
+                        while len(self.validators) > self.max_validators:
+                            self.validators.popitem(last=False)
+        except Exception:
+            with self._lock:
+                health.record(False, time.monotonic() - start)
+            raise
+        with self._lock:
+            health.record(True, time.monotonic() - start)
+            if feed is NOT_MODIFIED:
+                self.not_modified += 1
+        return feed
+
+    def fetch(self, path, conditional=False):
+        """Return the parsed feed for `path` from the first instance that serves it.
+
+        With `conditional`, instances are sent the ETag/Last-Modified they last
+        returned for `path`, and NOT_MODIFIED is returned if the feed is unchanged.
+        """
+        end = time.monotonic() + self.deadline
+        candidates = self._candidates()
+        if not candidates:
+            debug_log("All Nitter circuit breakers are open")
+            raise Exception("All Nitter instances failed: every circuit breaker is open")
+        errors = []
+        while candidates and time.monotonic() < end:
+            wave, candidates = candidates[:self.hedge], candidates[self.hedge:]
+            futures = {self._pool.submit(self._request, base_url, path, conditional): base_url for base_url in wave}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    try:
+                        feed = future.result()
+                    except Exception as e:
+                        debug_log(f"Nitter instance failed: {futures[future]} ({str(e)})")
+                        errors.append((futures[future], str(e)))
+                        continue
+                    return feed
+        debug_log(f"All Nitter instances failed: {errors}")
+        raise Exception("All Nitter instances failed")
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {instance: self.health[instance].status(now) for instance in self.instances}
+
+
+fetcher = NitterFetcher(
+    NITTER_INSTANCES,
+    hedge=int(os.environ.get('NITTER_HEDGE', 2)),
+    timeout=float(os.environ.get('NITTER_TIMEOUT', 5)),
+    deadline=float(os.environ.get('NITTER_DEADLINE', 12)),
+    max_feeds=NITTER_MAX_FEEDS,
+)
+# Hashtag queries of get_random_tweets run concurrently on this
+fanout = FanOutExecutor(max_workers=8)
+
+feed_cache = FeedEntryCache(max_feeds=NITTER_MAX_FEEDS)
+
+def fetch_from_nitter(path, limit=10, new_only=False, consumer='default'):
+    """Fetch a Nitter RSS path with hedged, conditional requests to the healthiest instances.
+
+    Returns the feed's latest entries, or with `new_only` just the entries
+    not yet returned to `consumer` for this path.
+    """
+    # Without cached entries a 304 would leave nothing to return, so ask for the full feed
+    feed = fetcher.fetch(path, conditional=path in feed_cache)
+    if feed is not NOT_MODIFIED:
+        feed_cache.update(path, feed.entries)
+    if new_only:
+        return feed_cache.take_unseen(path, consumer, limit)
+    return feed_cache.entries(path)[:limit]
 
 def sanitize_hashtag(hashtag):
     """Ensure hashtag does not start with # or ##."""
@@ -49,18 +305,18 @@ def sanitize_hashtag(hashtag):
         return hashtag.lstrip('#')
     return hashtag
 
-def get_tweets_by_username(username, limit=10):
-    """Fetch tweets by username using Nitter RSS with instance rotation"""
+def get_tweets_by_username(username, limit=10, new_only=False, consumer='default'):
+    """Fetch tweets by username using Nitter RSS; `new_only` skips tweets already returned to `consumer`"""
     debug_log(f"Fetching tweets for username: {username}, limit: {limit}")
     tweets = []
     path = f"/{username}/rss"
     try:
-        entries = fetch_from_nitter(path, limit)
+        entries = fetch_from_nitter(path, limit, new_only=new_only, consumer=consumer)
         for entry in entries:
             tweets.append({
                 "username": username,
                 "display_name": entry.get("author", username),
-                "tweet_id": entry.get("id", entry.get("link", "")),
+                "tweet_id": FeedEntryCache.entry_id(entry),
                 "text": entry.get("title", ""),
                 "timestamp": entry.get("published", ""),
                 "images": []  # Nitter RSS does not directly provide images
@@ -72,18 +328,18 @@ def get_tweets_by_username(username, limit=10):
         debug_log(f"Error fetching tweets: {str(e)}")
         return []
 
-def get_tweets_by_hashtag(hashtag, limit=10):
+def get_tweets_by_hashtag(hashtag, limit=10, new_only=False, consumer='default'):
     hashtag = sanitize_hashtag(hashtag)
     debug_log(f"Fetching tweets for hashtag: {hashtag}, limit: {limit}")
     tweets = []
     path = f"/search/rss?f=tweets&q=%23{hashtag}"
     try:
-        entries = fetch_from_nitter(path, limit)
+        entries = fetch_from_nitter(path, limit, new_only=new_only, consumer=consumer)
         for entry in entries:
             tweets.append({
                 "username": entry.get("author", ""),
                 "display_name": entry.get("author", ""),
-                "tweet_id": entry.get("id", entry.get("link", "")),
+                "tweet_id": FeedEntryCache.entry_id(entry),
                 "text": entry.get("title", ""),
                 "timestamp": entry.get("published", ""),
                 "images": []
@@ -97,15 +353,16 @@ def get_tweets_by_hashtag(hashtag, limit=10):
 def get_random_tweets(limit=10):
     debug_log(f"Fetching random timeline tweets, limit: {limit}")
     hashtags = ['tech', 'news', 'sports', 'entertainment', 'travel', 'AI', 'science', 'politics', 'music', 'movies']
-    tweets = []
-    import random
     random.shuffle(hashtags)
     try:
-        for hashtag in hashtags:
-            if len(tweets) >= limit:
-                break
-            fetched = get_tweets_by_hashtag(hashtag, limit)
-            tweets.extend(fetched)
+        # Query hashtags concurrently and stop launching more once enough tweets came back
+        results, _ = fanout.run(
+            [(hashtag, functools.partial(get_tweets_by_hashtag, hashtag, limit)) for hashtag in hashtags],
+            deadline=fetcher.deadline,
+            concurrency=4,
+            stop_when=lambda fetched: sum(len(t) for t in fetched) >= limit,
+        )
+        tweets = [tweet for _, fetched in results for tweet in fetched]
         random.shuffle(tweets)
         tweets = tweets[:limit]
         debug_log(f"Returning {len(tweets)} random timeline tweets.")
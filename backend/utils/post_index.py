@@ -0,0 +1,156 @@
+import bisect
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class PostIndex:
+    """Incrementally maintained inverted index over fetched Reddit posts, ranked with BM25.
+
+    Every post the backend fetches is added (or re-added, replacing the old
+    version) with its title and selftext tokenized; title terms count
+    `title_weight` times. The oldest posts are evicted past `max_docs`. The last
+    query term also matches as a prefix, so search-as-you-type works on partial
+    words.
+    """
+
+    def __init__(self, max_docs=50000, k1=1.2, b=0.75, title_weight=2, max_prefix_terms=50):
+        self.max_docs = max_docs
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.max_prefix_terms = max_prefix_terms
+        self._docs = OrderedDict()  # post_id -> (post, term frequencies, length)
+        self._postings = {}  # term -> {post_id: tf}
+        self._terms = []  # sorted vocabulary for prefix expansion
+        self._sentiments = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, posts):
+        """Index `posts` (a post dict or a list of them); returns how many were added."""
+        if isinstance(posts, dict):
+            posts = [posts]
+        added = 0
+        with self._lock:
+            for post in posts:
+                post_id = post.get('post_id')
+                if not post_id:
+                    continue
+                # A listing refresh re-adds the same post; keep the sentiment scored for it
+                self._remove(post_id, keep_sentiment=True)
+                tf = Counter(tokenize(post.get('text')))
+                for term in tokenize(post.get('title')):
+                    tf[term] += self.title_weight
+                length = sum(tf.values())
+                self._docs[post_id] = (dict(post), tf, length)
+                self._total_length += length
+                for term, count in tf.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = {}
+                        bisect.insort(self._terms, term)
+                    postings[post_id] = count
+                sentiment = post.get('sentiment')
+                if isinstance(sentiment, dict):
+                    sentiment = sentiment.get('sentiment')
+                if sentiment:
+                    self._sentiments[post_id] = sentiment
+                added += 1
+            while len(self._docs) > self.max_docs:
+                self._remove(next(iter(self._docs)))
+        return added
+
+    def set_sentiment(self, post_id, sentiment):
+        with self._lock:
+            if sentiment and post_id in self._docs:
+                self._sentiments[post_id] = sentiment
+
+    def _remove(self, post_id, keep_sentiment=False):
+        # Caller holds the lock
+        entry = self._docs.pop(post_id, None)
+        if entry is None:
+            return
+        _, tf, length = entry
+        self._total_length -= length
+        if not keep_sentiment:
+            self._sentiments.pop(post_id, None)
+        for term in tf:
+            postings = self._postings[term]
+            del postings[post_id]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def _expand_prefix(self, prefix):
+        start = bisect.bisect_left(self._terms, prefix)
+        expanded = []
+        for term in self._terms[start:start + self.max_prefix_terms]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def search(self, query, limit=20, sentiment=None, subreddit=None, prefix=True):
+        """Return up to `limit` indexed posts matching `query`, best BM25 score first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            # Each query term contributes its best-scoring expansion, so a prefix never outweighs a whole word
+            groups = [[term] for term in dict.fromkeys(terms[:-1])]
+            last = terms[-1]
+            groups.append(self._expand_prefix(last) if prefix else [last])
+            scores = {}
+            for group in groups:
+                group_scores = {}
+                for term in group:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for post_id, tf in postings.items():
+                        length = self._docs[post_id][2]
+                        score = idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                        if score > group_scores.get(post_id, 0.0):
+                            group_scores[post_id] = score
+                for post_id, score in group_scores.items():
+                    scores[post_id] = scores.get(post_id, 0.0) + score
+            if sentiment:
+                wanted = sentiment.lower()
+                scores = {p: s for p, s in scores.items() if self._sentiments.get(p, '').lower() == wanted}
+            if subreddit:
+                wanted = subreddit.lower()
+                scores = {p: s for p, s in scores.items() if str(self._docs[p][0].get('subreddit', '')).lower() == wanted}
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -(self._docs[item[0]][0].get('timestamp') or 0)))
+            results = []
+            for post_id, _ in ranked[:limit]:
+                post = dict(self._docs[post_id][0])
+                if post_id in self._sentiments:
+                    post.setdefault('sentiment', self._sentiments[post_id])
+                results.append(post)
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'terms': len(self._postings),
+                'with_sentiment': len(self._sentiments),
+                'avg_length': round(self._total_length / len(self._docs), 1) if self._docs else 0.0,
+            }
+
+
+post_index = PostIndex(max_docs=int(os.environ.get('POST_INDEX_MAX_DOCS', 50000)))
@@ -0,0 +1,208 @@
+import contextlib
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_context = threading.local()
+
+
+class RateLimitShed(Exception):
+    """Raised instead of sending a Reddit request when the shared rate-limit budget is too low."""
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Tag Reddit requests made by this thread (e.g. background ingestion) with a priority."""
+    previous = getattr(_context, 'priority', INTERACTIVE)
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+class RateLimitBudget:
+    """Process-wide view of Reddit's rate-limit window, fed by its X-Ratelimit-* headers.
+
+    Every request takes a token from the remaining budget before it is sent.
+    Interactive requests wait (up to `max_wait` seconds) for the window to reset
+    when the budget is exhausted; background requests are shed once the budget
+    drops to `background_reserve`, keeping that headroom for interactive traffic.
+    """
+
+    def __init__(self, background_reserve=100, max_wait=10.0):
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self.remaining = None
+        self.reset_at = 0.0
+        self.shed = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.waited_seconds = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, priority):
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.remaining is not None and now >= self.reset_at:
+                    # Window rolled over; the next response will report the new budget
+                    self.remaining = None
+                if self.remaining is None:
+                    return
+                floor = self.background_reserve if priority == BACKGROUND else 0
+                if self.remaining > floor:
+                    self.remaining -= 1
+                    return
+                if priority == BACKGROUND or now >= deadline:
+                    self.shed[priority] = self.shed.get(priority, 0) + 1
+                    raise RateLimitShed(f"Reddit rate-limit budget exhausted ({priority} request shed)")
+                wait = min(deadline, self.reset_at) - now
+                self.waited_seconds += wait
+                self._cond.wait(timeout=wait)
+
+    def update(self, headers):
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining = float(remaining)
+            reset = float(reset)
+        except ValueError:
+            return
+        with self._cond:
+            self.remaining = remaining
+            self.reset_at = time.monotonic() + reset
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'remaining': self.remaining,
+                'reset_in': max(0.0, self.reset_at - time.monotonic()) if self.remaining is not None else None,
+                'shed': dict(self.shed),
+                'waited_seconds': round(self.waited_seconds, 3),
+            }
+
+
+_ID_SEGMENT = re.compile(r'/(r|u|user|comments|by_id|duplicates)/[^/?]+')
+
+
+def endpoint_name(method, url):
+    """Normalize a Reddit URL to an endpoint template, e.g. 'GET /r/{}/hot'."""
+    path = requests.utils.urlparse(url).path.rstrip('/') or '/'
+    return f"{method.upper()} {_ID_SEGMENT.sub(lambda m: f'/{m.group(1)}/{{}}', path)}"
+
+
+class RateLimitedSession(requests.Session):
+    """HTTP session shared by pooled PRAW clients: keep-alive pooling, budget and accounting."""
+
+    def __init__(self, budget, pool_size=16):
+        super(RateLimitedSession, self).__init__()
+        self.budget = budget
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.endpoints = {}
+        self._stats_lock = threading.Lock()
+
+    def request(self, method, url, *args, **kwargs):
+        self.budget.acquire(getattr(_context, 'priority', INTERACTIVE))
+        start = time.perf_counter()
+        error = False
+        try:
+            response = super(RateLimitedSession, self).request(method, url, *args, **kwargs)
+            self.budget.update(response.headers)
+            error = response.status_code >= 400
+            return response
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._record(endpoint_name(method, url), time.perf_counter() - start, error)
+
+    def _record(self, endpoint, seconds, error):
+        with self._stats_lock:
+            stats = self.endpoints.setdefault(endpoint, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+
+    def endpoint_stats(self):
+        with self._stats_lock:
+            return {
+                endpoint: {**stats, 'avg_ms': round(stats['total_ms'] / stats['calls'], 2) if stats['calls'] else 0.0}
+                for endpoint, stats in self.endpoints.items()
+            }
+
+
+class RedditClientPool:
+    """Process-wide pool of PRAW clients sharing one HTTP session and rate-limit budget.
+
+    Credentials come from REDDIT_CLIENT_ID / REDDIT_CLIENT_SECRET /
+    REDDIT_USER_AGENT; REDDIT_OAUTH_URL and REDDIT_URL can point the clients at
+    another server (e.g. a local fake Reddit for tests).
+    """
+
+    def __init__(self, size=4, budget=None):
+        self.size = size
+        self.budget = budget or RateLimitBudget(
+            background_reserve=int(os.environ.get('REDDIT_BACKGROUND_RESERVE', 100)),
+            max_wait=float(os.environ.get('REDDIT_MAX_WAIT', 10)),
+        )
+        self.session = RateLimitedSession(self.budget, pool_size=max(16, size * 4))
+        self._clients = None
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    def _build_client(self):
+        import praw
+        kwargs = {
+            'client_id': os.environ['REDDIT_CLIENT_ID'],
+            'client_secret': os.environ.get('REDDIT_CLIENT_SECRET'),
+            'user_agent': os.environ.get('REDDIT_USER_AGENT', 'sentiment-detection/1.0'),
+            'requestor_kwargs': {'session': self.session},
+            'check_for_updates': False,
+        }
+        if os.environ.get('REDDIT_OAUTH_URL'):
+            kwargs['oauth_url'] = os.environ['REDDIT_OAUTH_URL']
+        if os.environ.get('REDDIT_URL'):
+            kwargs['reddit_url'] = os.environ['REDDIT_URL']
+        return praw.Reddit(**kwargs)
+
+    def get(self):
+        if self._clients is None:
+            with self._lock:
+                if self._clients is None:
+                    clients = [self._build_client() for _ in range(self.size)]
+                    self._cycle = itertools.cycle(clients)
+                    self._clients = clients
+        with self._lock:
+            return next(self._cycle)
+
+    def stats(self):
+        return {'clients': len(self._clients or []), 'budget': self.budget.stats(), 'endpoints': self.session.endpoint_stats()}
+
+
+pool = RedditClientPool(size=int(os.environ.get('REDDIT_POOL_SIZE', 4)))
+
+
+def get_reddit_client():
+    if os.environ.get('REDDIT_CLIENT_ID'):
+        return pool.get()
+    # Fall back to a locally provided client module when no credentials are configured
+    try:
+        from .reddit_hardcoded_client import get_reddit_client as get_hardcoded_client
+    except ImportError:
+        raise RuntimeError("Reddit credentials not configured: set REDDIT_CLIENT_ID and REDDIT_CLIENT_SECRET")
+    logging.debug("Using reddit_hardcoded_client; requests bypass the shared client pool")
+    return get_hardcoded_client()
@@ -1,6 +1,58 @@
-from .reddit_hardcoded_client import get_reddit_client
+import heapq
+import os
+from praw.models import MoreComments
+from .reddit_client_pool import get_reddit_client
+from .listing_cache import avatar_cache, listing_cache
+from .author_index import author_index
+from .post_index import post_index
 
-def get_posts_from_subreddit(subreddit_name, limit=10):
+def extract_images(submission):
+    """Image URLs of a submission: gallery items, preview images and a direct image link."""
+    images = []
+    if hasattr(submission, 'is_gallery') and submission.is_gallery:
+        if hasattr(submission, 'media_metadata') and submission.media_metadata:
+            for item in submission.media_metadata.values():
+                if 's' in item and 'u' in item['s']:
+                    images.append(item['s']['u'].replace('&amp;', '&'))
+    elif hasattr(submission, 'preview') and 'images' in submission.preview:
+        for img in submission.preview['images']:
+            if 'source' in img and 'url' in img['source']:
+                images.append(img['source']['url'].replace('&amp;', '&'))
+    # Fallback to main url if it's an image
+    if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')):
+        images.append(submission.url)
+    # Remove duplicates
+    return list(dict.fromkeys(images))
+
+DEFAULT_AVATAR_URL = 'https://www.redditstatic.com/avatars/avatar_default_02_24A0ED.png'  # Default Reddit avatar
+# Seconds a listing waits for avatars missing from the cache before showing the default
+AVATAR_WAIT = float(os.environ.get('AVATAR_WAIT', 1.5))
+
+def get_posts_from_subreddit(subreddit_name, limit=10, avatars=True):
+    # Served from the listing cache; a stale listing is returned while it refreshes
+    posts = listing_cache.get_or_fetch(('subreddit', subreddit_name.lower(), 'hot', limit),
+                                       lambda: _fetch_posts_from_subreddit(subreddit_name, limit))
+    return with_avatars(posts) if avatars else list(posts)
+
+def _fetch_avatar(name):
+    try:
+        return getattr(get_reddit_client().redditor(name), 'icon_img', None) or DEFAULT_AVATAR_URL
+    except Exception:
+        return DEFAULT_AVATAR_URL
+
+def with_avatars(posts, wait=AVATAR_WAIT):
+    """Copies of `posts` with `profile_pic_url` filled in from the avatar cache.
+
+    Avatars are resolved when a listing is served rather than frozen into the
+    cached listing. Missing ones are fetched concurrently; any not back within
+    `wait` seconds show the default this time and are cached for the next view.
+    """
+    names = {post['author'].lower() for post in posts if post.get('author') and post['author'] != '[deleted]'}
+    avatars = avatar_cache.get_many(names, _fetch_avatar, wait, DEFAULT_AVATAR_URL) if names else {}
+    return [{**post, 'profile_pic_url': avatars.get(str(post.get('author')).lower(), DEFAULT_AVATAR_URL)}
+            for post in posts]
+
+def _fetch_posts_from_subreddit(subreddit_name, limit=10):
     reddit = get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
     posts = []
@@ -9,29 +61,7 @@ def get_posts_from_subreddit(subreddit_name, limit=10):
         if not submission.title and not submission.selftext:
             continue
         author = str(submission.author) if submission.author else '[deleted]'
-        # Reddit avatar API (fallback to placeholder)
-        profile_pic_url = f'https://www.redditstatic.com/avatars/avatar_default_02_24A0ED.png'  # Default Reddit avatar
-        try:
-            if hasattr(submission.author, 'icon_img') and submission.author.icon_img:
-                profile_pic_url = submission.author.icon_img
-        except Exception:
-            pass
-        # Extract images
-        images = []
-        if hasattr(submission, 'is_gallery') and submission.is_gallery:
-            if hasattr(submission, 'media_metadata') and submission.media_metadata:
-                for item in submission.media_metadata.values():
-                    if 's' in item and 'u' in item['s']:
-                        images.append(item['s']['u'].replace('&amp;', '&'))
-        elif hasattr(submission, 'preview') and 'images' in submission.preview:
-            for img in submission.preview['images']:
-                if 'source' in img and 'url' in img['source']:
-                    images.append(img['source']['url'].replace('&amp;', '&'))
-        # Fallback to main url if it's an image
-        if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')):
-            images.append(submission.url)
-        # Remove duplicates
-        images = list(dict.fromkeys(images))
+        images = extract_images(submission)
         posts.append({
             'post_id': submission.id,
             'title': submission.title,
@@ -40,31 +70,17 @@ def get_posts_from_subreddit(subreddit_name, limit=10):
             'images': images,
             'num_comments': submission.num_comments,
             'author': author,
-            'profile_pic_url': profile_pic_url,
             'subreddit': str(submission.subreddit),
             'timestamp': int(submission.created_utc)
         })
+    post_index.add(posts)
+    author_index.add(post['author'] for post in posts)
     return posts
 
 def get_post_and_comments(post_url):
     reddit = get_reddit_client()
     submission = reddit.submission(url=post_url)
-    # Extract images
-    images = []
-    if hasattr(submission, 'is_gallery') and submission.is_gallery:
-        if hasattr(submission, 'media_metadata') and submission.media_metadata:
-            for item in submission.media_metadata.values():
-                if 's' in item and 'u' in item['s']:
-                    images.append(item['s']['u'].replace('&amp;', '&'))
-    elif hasattr(submission, 'preview') and 'images' in submission.preview:
-        for img in submission.preview['images']:
-            if 'source' in img and 'url' in img['source']:
-                images.append(img['source']['url'].replace('&amp;', '&'))
-    # Fallback to main url if it's an image
-    if submission.url.lower().endswith(('.jpg', '.jpeg', '.png')):
-        images.append(submission.url)
-    # Remove duplicates
-    images = list(dict.fromkeys(images))
+    images = extract_images(submission)
     post = {
         'post_id': submission.id,
         'title': submission.title,
@@ -76,6 +92,7 @@ def get_post_and_comments(post_url):
         'subreddit': str(submission.subreddit),
         'timestamp': int(submission.created_utc)
     }
+    post_index.add(post)
     submission.comments.replace_more(limit=0)
     comments = []
     for comment in submission.comments.list():
@@ -85,4 +102,69 @@ def get_post_and_comments(post_url):
             'author': str(comment.author) if comment.author else '[deleted]',
             'images': []  # Reddit comments rarely have images
         })
+    author_index.add([post['author']] + [comment['author'] for comment in comments])
     return post, comments
+
+def iter_post_and_comments(post_id, chunk_size=64, more_limit=0):
+    """Yield ('post', post) and then ('comments', [comment, ...]) chunks as they are fetched.
+
+    Comments already loaded with the submission are yielded first. If `more_limit`
+    is set, up to that many "load more" stubs are then expanded one at a time,
+    largest first, and the comments each one reveals follow immediately, so
+    callers can work on earlier chunks while the rest is still being fetched.
+    """
+    reddit = get_reddit_client()
+    submission = reddit.submission(id=post_id)
+    post = {
+        'post_id': submission.id,
+        'title': submission.title,
+        'text': submission.selftext,
+        'url': submission.url,
+        'images': extract_images(submission),
+        'num_comments': submission.num_comments,
+        'author': str(submission.author) if submission.author else '[deleted]',
+        'subreddit': str(submission.subreddit),
+        'timestamp': int(submission.created_utc)
+    }
+    post_index.add(post)
+    author_index.add([post['author']])
+    yield 'post', post
+    seen = set()
+
+    def new_comments(comments):
+        chunk = []
+        for comment in comments:
+            if isinstance(comment, MoreComments) or comment.id in seen:
+                continue
+            seen.add(comment.id)
+            chunk.append({
+                'id': comment.id,
+                'author': str(comment.author) if comment.author else '[deleted]',
+                'text': comment.body
+            })
+            if len(chunk) >= chunk_size:
+                author_index.add(comment['author'] for comment in chunk)
+                yield chunk
+                chunk = []
+        if chunk:
+            author_index.add(comment['author'] for comment in chunk)
+            yield chunk
+
+    for chunk in new_comments(submission.comments.list()):
+        yield 'comments', chunk
+    if not more_limit:
+        return
+    # replace_more drops every stub past its limit, so take them all out once and expand them here
+    stubs = submission.comments.replace_more(limit=0)
+    heapq.heapify(stubs)
+    for _ in range(more_limit):
+        if not stubs:
+            break
+        revealed = heapq.heappop(stubs).comments()
+        # "Continue this thread" stubs come back as a forest rather than a flat list
+        revealed = revealed.list() if hasattr(revealed, 'list') else revealed
+        for item in revealed:
+            if isinstance(item, MoreComments):
+                heapq.heappush(stubs, item)
+        for chunk in new_comments(revealed):
+            yield 'comments', chunk
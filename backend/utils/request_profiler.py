@@ -0,0 +1,132 @@
+import contextlib
+import hmac
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function
+from models.stages import add_observer, annotate_stages
+
+
+class RequestProfiler:
+    """Opt-in torch.profiler capture of individual requests.
+
+    A request is profiled when it carries the `X-Profile: 1` header, or when
+    sampling is enabled (at startup or from the admin endpoint) and it falls
+    within `sample_rate`. Both the header and the admin endpoints require an
+    `X-Profile-Token` matching `token`; without a configured token clients
+    cannot trigger or configure profiling at all. Only one request is profiled
+    at a time; others arriving meanwhile run normally.
+
+    Each capture records operator-level CPU (and CUDA, when available)
+    activity with the inference stages as named ranges, and is written to
+    `trace_dir` as a Chrome trace, viewable in chrome://tracing or
+    ui.perfetto.dev. Only the newest `max_traces` files are kept.
+    """
+
+    def __init__(self, trace_dir, sample_rate=0.0, max_traces=20, token=None):
+        self.trace_dir = trace_dir
+        self.sample_rate = sample_rate
+        self.enabled = sample_rate > 0
+        self.max_traces = max_traces
+        self.token = token
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._recent = deque(maxlen=max_traces)
+        self.profiled = 0
+        self.skipped_busy = 0
+        add_observer(self._observe_stage)
+
+    def authorized(self, headers):
+        return bool(self.token) and hmac.compare_digest(headers.get('X-Profile-Token', ''), self.token)
+
+    def should_profile(self, headers):
+        if headers.get('X-Profile', '').lower() in ('1', 'true', 'yes'):
+            return self.authorized(headers)
+        return self.enabled and random.random() < self.sample_rate
+
+    def configure(self, enabled=None, sample_rate=None):
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        if enabled is not None:
+            self.enabled = bool(enabled)
+
+    def _observe_stage(self, name, seconds):
+        stages = getattr(self._local, 'stages', None)
+        if stages is not None:
+            stages.append((name, seconds))
+
+    @contextlib.contextmanager
+    def capture(self, name):
+        """Profile the block; yields a dict that is filled with the trace summary on exit, or None if busy."""
+        if not self._lock.acquire(blocking=False):
+            self.skipped_busy += 1
+            yield None
+            return
+        summary = {'name': name}
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        self._local.stages = []
+        start = time.perf_counter()
+        try:
+            with profile(activities=activities, record_shapes=True) as prof:
+                with annotate_stages(), record_function(name):
+                    yield summary
+            summary['seconds'] = round(time.perf_counter() - start, 6)
+            summary['stages'] = [{'stage': stage, 'seconds': round(seconds, 6)} for stage, seconds in self._local.stages]
+            try:
+                summary['trace'] = self._export(prof, name)
+            except OSError as e:
+                logging.warning("Failed to write profile trace for %s: %s", name, e)
+                return
+            self._recent.append(summary)
+            self.profiled += 1
+        finally:
+            self._local.stages = None
+            self._lock.release()
+
+    def _export(self, prof, name):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{re.sub(r'[^A-Za-z0-9_-]', '_', name)}.json"
+        prof.export_chrome_trace(os.path.join(self.trace_dir, filename))
+        self._prune()
+        return filename
+
+    def _prune(self):
+        traces = sorted(f for f in os.listdir(self.trace_dir) if f.endswith('.json'))
+        for filename in traces[:max(0, len(traces) - self.max_traces)]:
+            try:
+                os.remove(os.path.join(self.trace_dir, filename))
+            except OSError:
+                pass
+
+    def trace_path(self, filename):
+        """Path of a retained trace, or None; `filename` must be a bare name as returned by the summaries."""
+        if os.path.basename(filename) != filename or not filename.endswith('.json'):
+            return None
+        path = os.path.join(self.trace_dir, filename)
+        return path if os.path.isfile(path) else None
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'trace_dir': self.trace_dir,
+            'max_traces': self.max_traces,
+            'profiled': self.profiled,
+            'skipped_busy': self.skipped_busy,
+            'recent': [summary for summary in self._recent if self.trace_path(summary['trace'])],
+        }
+
+
+request_profiler = RequestProfiler(
+    trace_dir=os.environ.get('PROFILE_TRACE_DIR', 'profiles'),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    max_traces=int(os.environ.get('PROFILE_MAX_TRACES', 20)),
+    token=os.environ.get('PROFILE_TOKEN') or None,
+)
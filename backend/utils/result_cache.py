@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Normalize text for cache keys: NFC form with runs of whitespace collapsed."""
+    if not text:
+        return ''
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class SentimentResultCache:
+    """Content-addressed cache of analysis results.
+
+    Entries are keyed by a hash of the normalized text, the raw image bytes and
+    the model identity, held in an in-memory LRU bounded by `max_bytes` and
+    expired after `ttl` seconds. When `db_path` is given, entries are also
+    written to a SQLite second tier that survives restarts.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=3600, db_path=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        self._writes = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS sentiment_cache '
+                '(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, result TEXT NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS idx_sentiment_cache_expires ON sentiment_cache (expires_at)')
+            self._db.commit()
+
+    @staticmethod
+    def make_key(text, image_bytes, model_id):
+        digest = hashlib.sha256()
+        digest.update(model_id.encode('utf-8'))
+        # Whitespace-only text is still scored as text, so keep it distinct from no text
+        digest.update(b'\x00T' if text else b'\x00-')
+        digest.update(normalize_text(text).encode('utf-8'))
+        digest.update(b'\x00')
+        if image_bytes:
+            digest.update(hashlib.sha256(image_bytes).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(payload)
+                del self._entries[key]
+                self._size -= size
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT expires_at, result FROM sentiment_cache WHERE key = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    self._insert(key, row[0], row[1])
+                    return json.loads(row[1])
+            self.misses += 1
+            return None
+
+    def set(self, key, result):
+        payload = json.dumps(result)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, expires_at, payload)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO sentiment_cache (key, expires_at, result) VALUES (?, ?, ?)',
+                        (key, expires_at, payload)
+                    )
+                    self._writes += 1
+                    # Prune expired rows every so often rather than on every write
+                    if self._writes % 1000 == 0:
+                        self._db.execute('DELETE FROM sentiment_cache WHERE expires_at <= ?', (time.time(),))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning("Failed to write sentiment cache entry to disk: %s", e)
+
+    def _insert(self, key, expires_at, payload):
+        size = len(key) + len(payload)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+        self._entries[key] = (expires_at, size, payload)
+        self._size += size
+        while self._size > self.max_bytes and self._entries:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,38 @@
+import logging
+import threading
+import time
+from .sentiment_store import item_id, sentiment_store, to_epoch
+from .trending import trending
+
+
+def record_results(items, results, kind, model_version, source='reddit'):
+    """Hand analysis results to every consumer: the persistent store and the trending aggregates.
+
+    Trending counts each (kind, id) once, so cache hits and re-analysis of an
+    already scored item do not inflate volumes.
+    """
+    sentiment_store.record_results(items, results, kind, model_version, source=source)
+    now = time.time()
+    for item, result in zip(items, results):
+        trending.add(item, result, to_epoch(item.get('timestamp')), now=now, item_key=_trending_key(kind, item))
+
+
+def _trending_key(kind, item):
+    key = item_id(item)
+    return (kind, key) if key else None
+
+
+def backfill_trending(background=True):
+    """Rebuild the in-memory trending windows from the store's last 7 days, e.g. after a restart."""
+    def run():
+        start = time.monotonic()
+        now = time.time()
+        count = 0
+        for item, result in sentiment_store.iter_since(now - 7 * 86400):
+            if trending.add(item, result, item['timestamp'], now=now, item_key=_trending_key(item['kind'], item)):
+                count += 1
+        logging.info(f"Backfilled trending aggregates from {count} stored results in {time.monotonic() - start:.2f}s")
+
+    if not background:
+        return run()
+    threading.Thread(target=run, name='trending-backfill', daemon=True).start()
@@ -0,0 +1,227 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Columns results can be aggregated by
+DIMENSIONS = ('subreddit', 'author', 'hashtag', 'source', 'kind')
+
+
+def to_epoch(timestamp):
+    """Epoch seconds from an int/float timestamp or an RFC 822 date (as in RSS feeds); None if unknown."""
+    if timestamp in (None, ''):
+        return None
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    try:
+        return int(float(timestamp))
+    except ValueError:
+        pass
+    try:
+        return int(parsedate_to_datetime(timestamp).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def item_id(item):
+    """The id of a post, comment or tweet dict, or None."""
+    value = item.get('post_id') or item.get('comment_id') or item.get('id') or item.get('tweet_id')
+    return str(value) if value else None
+
+
+class SentimentStore:
+    """Persistent SQLite store of every analyzed post, comment and tweet.
+
+    Each row keeps the item's ids, subreddit/author/hashtag, creation time,
+    sentiment distribution, engine and model version, indexed per dimension
+    by time so aggregate queries are range scans grouped inside SQLite.
+    Writes go through a queue and are committed in batches by a writer
+    thread, keeping them off the request path. The database is opened, and
+    the writer started, on first use.
+    """
+
+    def __init__(self, db_path, batch_size=256, flush_interval=1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._db = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self.written = 0
+        self.write_errors = 0
+
+    def _connection(self):
+        """The open database; callers hold `_lock`."""
+        if self._db is not None:
+            return self._db
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS sentiment_results ('
+            'item_id TEXT NOT NULL, kind TEXT NOT NULL, source TEXT NOT NULL, parent_id TEXT, '
+            'subreddit TEXT COLLATE NOCASE, author TEXT COLLATE NOCASE, hashtag TEXT COLLATE NOCASE, '
+            'created_at INTEGER NOT NULL, analyzed_at REAL NOT NULL, sentiment TEXT NOT NULL, '
+            'negative REAL NOT NULL, neutral REAL NOT NULL, positive REAL NOT NULL, '
+            'engine TEXT, model_version TEXT NOT NULL, '
+            'PRIMARY KEY (kind, item_id, model_version))'
+        )
+        for dimension in ('subreddit', 'author', 'hashtag'):
+            db.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_sentiment_results_{dimension} '
+                f'ON sentiment_results ({dimension}, created_at)'
+            )
+        db.execute('CREATE INDEX IF NOT EXISTS idx_sentiment_results_created ON sentiment_results (created_at)')
+        db.commit()
+        self._db = db
+        threading.Thread(target=self._writer, name='sentiment-store', daemon=True).start()
+        return db
+
+    def record_results(self, items, results, kind, model_version, source='reddit'):
+        """Queue analysis `results` for the matching `items` (post/comment/tweet dicts).
+
+        Items without an id and results without a distribution are skipped.
+        """
+        now = time.time()
+        rows = []
+        for item, result in zip(items, results):
+            key = item_id(item)
+            distribution = result.get('distribution') if result else None
+            if not key or not distribution:
+                continue
+            rows.append((
+                key, kind, source, item.get('parent_id'),
+                item.get('subreddit'), item.get('author') or item.get('username'), item.get('hashtag'),
+                to_epoch(item.get('timestamp')) or int(now), now, result['sentiment'],
+                distribution.get('Negative', 0.0), distribution.get('Neutral', 0.0), distribution.get('Positive', 0.0),
+                result.get('engine'), model_version,
+            ))
+        if rows:
+            if self._db is None:
+                with self._lock:
+                    self._connection()
+            self._queue.put(rows)
+        return len(rows)
+
+    def _writer(self):
+        while True:
+            rows = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            # Gather whatever else arrives shortly after, so each commit covers a batch of rows
+            while len(rows) < self.batch_size:
+                try:
+                    rows.extend(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._write(rows)
+
+    def _write(self, rows):
+        with self._lock:
+            try:
+                db = self._connection()
+                db.executemany(
+                    'INSERT OR REPLACE INTO sentiment_results (item_id, kind, source, parent_id, subreddit, author, '
+                    'hashtag, created_at, analyzed_at, sentiment, negative, neutral, positive, engine, model_version) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                db.commit()
+                self.written += len(rows)
+            except sqlite3.Error as e:
+                self.write_errors += len(rows)
+                logging.warning("Failed to write %d sentiment results: %s", len(rows), e)
+
+    def flush(self):
+        """Write everything queued so far synchronously."""
+        rows = []
+        while True:
+            try:
+                rows.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if rows:
+            self._write(rows)
+
+    @staticmethod
+    def _filters(dimension, value, since, until, kind):
+        clauses, params = [], []
+        if dimension is not None:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension {dimension!r}; expected one of {', '.join(DIMENSIONS)}")
+            if value is not None:
+                clauses.append(f'{dimension} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(int(since))
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(int(until))
+        if kind is not None:
+            clauses.append('kind = ?')
+            params.append(kind)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    _AGGREGATES = (
+        'COUNT(*), AVG(negative), AVG(neutral), AVG(positive), '
+        "SUM(sentiment = 'Negative'), SUM(sentiment = 'Neutral'), SUM(sentiment = 'Positive')"
+    )
+
+    @staticmethod
+    def _aggregate(row):
+        count, negative, neutral, positive, n_negative, n_neutral, n_positive = row
+        return {
+            'count': count,
+            'avg_distribution': {'Negative': negative or 0.0, 'Neutral': neutral or 0.0, 'Positive': positive or 0.0},
+            'sentiments': {'Negative': n_negative or 0, 'Neutral': n_neutral or 0, 'Positive': n_positive or 0},
+        }
+
+    def sentiment_over_time(self, dimension, value, bucket_seconds=3600, since=None, until=None, kind=None):
+        """Sentiment of items matching `dimension` = `value`, bucketed by creation time."""
+        bucket_seconds = max(1, int(bucket_seconds))
+        where, params = self._filters(dimension, value, since, until, kind)
+        with self._lock:
+            rows = self._connection().execute(
+                f'SELECT (created_at / ?) * ? AS bucket, {self._AGGREGATES} FROM sentiment_results{where} '
+                'GROUP BY bucket ORDER BY bucket',
+                [bucket_seconds, bucket_seconds] + params
+            ).fetchall()
+        return [{'bucket_start': row[0], **self._aggregate(row[1:])} for row in rows]
+
+    def top(self, dimension, since=None, until=None, kind=None, limit=10):
+        """Most active values of `dimension` (e.g. subreddits) with their sentiment."""
+        where, params = self._filters(dimension, None, since, until, kind)
+        where += (' AND ' if where else ' WHERE ') + f'{dimension} IS NOT NULL'
+        with self._lock:
+            rows = self._connection().execute(
+                f'SELECT {dimension}, {self._AGGREGATES} FROM sentiment_results{where} '
+                f'GROUP BY {dimension} ORDER BY COUNT(*) DESC LIMIT ?',
+                params + [int(limit)]
+            ).fetchall()
+        return [{dimension: row[0], **self._aggregate(row[1:])} for row in rows]
+
+    def iter_since(self, since):
+        """Yield (item dict, result dict) pairs for rows created at or after `since`; items carry their id and kind."""
+        with self._lock:
+            cursor = self._connection().execute(
+                'SELECT item_id, kind, subreddit, author, hashtag, created_at, sentiment, negative, neutral, positive '
+                'FROM sentiment_results WHERE created_at >= ?', (int(since),)
+            )
+            rows = cursor.fetchall()
+        for item_id, kind, subreddit, author, hashtag, created_at, sentiment, negative, neutral, positive in rows:
+            yield (
+                {'id': item_id, 'kind': kind, 'subreddit': subreddit, 'author': author, 'hashtag': hashtag,
+                 'timestamp': created_at},
+                {'sentiment': sentiment, 'distribution': {'Negative': negative, 'Neutral': neutral, 'Positive': positive}},
+            )
+
+    def stats(self):
+        with self._lock:
+            rows = self._connection().execute('SELECT COUNT(*) FROM sentiment_results').fetchone()[0]
+        return {'rows': rows, 'queued_batches': self._queue.qsize(), 'written': self.written, 'write_errors': self.write_errors}
+
+
+sentiment_store = SentimentStore(os.environ.get('SENTIMENT_STORE_DB', 'sentiment_store.db'))
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SENTIMENTS = ('Negative', 'Neutral', 'Positive')
+# Window name -> (bucket width in seconds, number of buckets)
+WINDOWS = {
+    '1h': (60, 60),
+    '24h': (900, 96),
+    '7d': (3600, 168),
+}
+DIMENSIONS = ('subreddit', 'hashtag', 'author')
+
+
+class RollingWindow:
+    """Sentiment volume and distribution sums over a sliding window of time buckets.
+
+    Buckets live in a ring buffer; running totals are kept alongside, so an
+    update only touches one bucket and reading the window is O(1). Buckets that
+    slide out of the window are subtracted from the totals as time advances.
+    """
+
+    __slots__ = ('width', 'size', 'head', 'epochs', 'counts', 'sums', 'total_count', 'total_counts', 'total_sums')
+
+    def __init__(self, width, size):
+        self.width = width
+        self.size = size
+        self.head = None  # newest bucket number seen
+        self.epochs = [None] * size
+        self.counts = [[0, 0, 0] for _ in range(size)]
+        self.sums = [[0.0, 0.0, 0.0] for _ in range(size)]
+        self.total_count = 0
+        self.total_counts = [0, 0, 0]
+        self.total_sums = [0.0, 0.0, 0.0]
+
+    def _clear(self, slot):
+        counts, sums = self.counts[slot], self.sums[slot]
+        self.total_count -= sum(counts)
+        for i in range(3):
+            self.total_counts[i] -= counts[i]
+            self.total_sums[i] -= sums[i]
+            counts[i] = 0
+            sums[i] = 0.0
+        self.epochs[slot] = None
+
+    def advance(self, now):
+        bucket = int(now // self.width)
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        # Expire every bucket that slid out; at most `size` of them however long it has been
+        for epoch in range(max(self.head + 1, bucket - self.size + 1), bucket + 1):
+            slot = epoch % self.size
+            if self.epochs[slot] is not None:
+                self._clear(slot)
+        self.head = bucket
+
+    def add(self, timestamp, sentiment_index, distribution, now):
+        self.advance(now)
+        bucket = int(min(timestamp, now) // self.width)
+        if bucket <= self.head - self.size:
+            return False
+        slot = bucket % self.size
+        if self.epochs[slot] != bucket:
+            if self.epochs[slot] is not None:
+                self._clear(slot)
+            self.epochs[slot] = bucket
+        self.counts[slot][sentiment_index] += 1
+        self.total_counts[sentiment_index] += 1
+        self.total_count += 1
+        for i in range(3):
+            self.sums[slot][i] += distribution[i]
+            self.total_sums[i] += distribution[i]
+        return True
+
+    def summary(self):
+        count = self.total_count
+        return {
+            'count': count,
+            'avg_distribution': {SENTIMENTS[i]: (self.total_sums[i] / count if count else 0.0) for i in range(3)},
+            'sentiments': {SENTIMENTS[i]: self.total_counts[i] for i in range(3)},
+        }
+
+
+class TrendingAggregator:
+    """Rolling 1h/24h/7d sentiment aggregates per subreddit, hashtag and author, held in memory.
+
+    Each result updates one bucket per window for every dimension it has a
+    value for, so both recording and serving /api/trending avoid recomputing
+    anything. Past `max_keys` per dimension, keys idle for the longest window
+    are swept out, then the quietest ones. Items passed with an `item_key`
+    are counted once, however often they are re-analyzed or served from cache;
+    the last `max_items` keys are remembered.
+    """
+
+    def __init__(self, windows=None, max_keys=20000, max_items=500000):
+        self.windows = dict(windows or WINDOWS)
+        self.max_keys = max_keys
+        self.max_items = max_items
+        self._counted = OrderedDict()  # item keys already in the windows
+        self._series = {dimension: {} for dimension in DIMENSIONS}  # dimension -> key -> {window: RollingWindow}
+        self._names = {}  # (dimension, lowercased key) -> key as first seen
+        self._lock = threading.Lock()
+
+    def add(self, item, result, timestamp=None, now=None, item_key=None):
+        """Count one analyzed item; returns False if it was skipped, e.g. because `item_key` was seen before."""
+        distribution = result.get('distribution') if result else None
+        if not distribution or result.get('sentiment') not in SENTIMENTS:
+            return False
+        now = time.time() if now is None else now
+        timestamp = now if timestamp is None else timestamp
+        sentiment_index = SENTIMENTS.index(result['sentiment'])
+        values = [distribution.get(s, 0.0) for s in SENTIMENTS]
+        with self._lock:
+            if item_key is not None:
+                if item_key in self._counted:
+                    return False
+                self._counted[item_key] = True
+                if len(self._counted) > self.max_items:
+                    self._counted.popitem(last=False)
+            for dimension in DIMENSIONS:
+                key = item.get(dimension)
+                if dimension == 'author':
+                    key = key or item.get('username')
+                if not key or key == '[deleted]':
+                    continue
+                series = self._series[dimension]
+                lowered = str(key).lower()
+                windows = series.get(lowered)
+                if windows is None:
+                    if len(series) >= self.max_keys:
+                        self._sweep(dimension, now)
+                    windows = series[lowered] = {name: RollingWindow(*spec) for name, spec in self.windows.items()}
+                    self._names[(dimension, lowered)] = str(key)
+                for window in windows.values():
+                    window.add(timestamp, sentiment_index, values, now)
+        return True
+
+    def _sweep(self, dimension, now):
+        # Caller holds the lock; drop keys with nothing left in their longest window, then the quietest
+        longest = max(self.windows, key=lambda name: self.windows[name][0] * self.windows[name][1])
+        series = self._series[dimension]
+        for key in list(series):
+            window = series[key][longest]
+            window.advance(now)
+            if not window.total_count:
+                del series[key]
+                self._names.pop((dimension, key), None)
+        excess = len(series) - int(self.max_keys * 0.9)
+        if excess > 0:
+            for key in sorted(series, key=lambda k: series[k][longest].total_count)[:excess]:
+                del series[key]
+                self._names.pop((dimension, key), None)
+
+    def trending(self, dimension, window='24h', sort='volume', limit=10, now=None):
+        """Top keys of `dimension` in `window`, by volume or by positive/negative share."""
+        if dimension not in self._series:
+            raise ValueError(f"Unknown dimension {dimension!r}; expected one of {', '.join(DIMENSIONS)}")
+        if window not in self.windows:
+            raise ValueError(f"Unknown window {window!r}; expected one of {', '.join(self.windows)}")
+        if sort not in ('volume', 'positive', 'negative'):
+            raise ValueError("sort must be one of volume, positive, negative")
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = []
+            for key, windows in self._series[dimension].items():
+                rolling = windows[window]
+                rolling.advance(now)
+                if rolling.total_count:
+                    rows.append({'key': self._names[(dimension, key)], **rolling.summary()})
+        if sort == 'volume':
+            rows.sort(key=lambda row: -row['count'])
+        else:
+            label = sort.capitalize()
+            rows.sort(key=lambda row: (-row['avg_distribution'][label], -row['count']))
+        return rows[:limit]
+
+    def series(self, dimension, key, now=None):
+        """Every window's aggregate for one key."""
+        now = time.time() if now is None else now
+        with self._lock:
+            windows = self._series.get(dimension, {}).get(str(key).lower())
+            if windows is None:
+                return None
+            result = {}
+            for name, rolling in windows.items():
+                rolling.advance(now)
+                result[name] = rolling.summary()
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {dimension: len(series) for dimension, series in self._series.items()}
+
+
+trending = TrendingAggregator(
+    max_keys=int(os.environ.get('TRENDING_MAX_KEYS', 20000)),
+    max_items=int(os.environ.get('TRENDING_MAX_ITEMS', 500000)),
+)
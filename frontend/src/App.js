@@ -76,7 +76,16 @@ function App() {
       // Prepare the data for analysis
       const data = {
         text: tweet.text && tweet.text.trim() ? tweet.text : (tweet.title || ''),
-        image: tweet.images && tweet.images.length > 0 ? tweet.images[0] : null
+        image: tweet.images && tweet.images.length > 0 ? tweet.images[0] : null,
+        // Lets the backend store the result for sentiment history
+        item: {
+          id: tweet.post_id || tweet.tweet_id,
+          kind: tweet.post_id ? 'post' : 'tweet',
+          source: tweet.post_id ? 'reddit' : 'nitter',
+          subreddit: tweet.subreddit,
+          author: tweet.author || tweet.username,
+          timestamp: tweet.timestamp
+        }
       };
 
       // If there's an image in the tweet, pass the URL directly to the backend
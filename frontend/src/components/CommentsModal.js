@@ -34,9 +34,38 @@ function CommentsModal({ post, onClose }) {
     setSentiment(null);
     try {
       const backendBaseUrl = 'http://localhost:5000';
-      const commentTexts = comments.map(c => c.text).filter(Boolean);
-      const response = await axios.post(`${backendBaseUrl}/api/analyze/comments`, { comments: commentTexts });
-      setSentiment(response.data);
+      // Send ids and authors along so the backend can store each comment's result
+      const commentItems = comments
+        .filter(c => c.text)
+        .map(c => ({ id: c.id, author: c.author, text: c.text, subreddit: post.subreddit, parent_id: post.post_id }));
+      // Stream NDJSON events so running aggregates show up before the whole thread is analyzed
+      const response = await fetch(`${backendBaseUrl}/api/analyze/comments/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ comments: commentItems, aggregate_every: 1 }),
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'aggregate' || event.type === 'done') {
+            setSentiment(event);
+          } else if (event.type === 'error') {
+            setSentiment({ error: event.error });
+          }
+        }
+      }
     } catch (err) {
       setSentiment({ error: 'Failed to analyze comments' });
     } finally {
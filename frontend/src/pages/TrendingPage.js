@@ -29,6 +29,22 @@ function TrendingPage() {
   const [analysisError, setAnalysisError] = useState('');
   const [showAnalysisPanel, setShowAnalysisPanel] = useState(false);
 
+  useEffect(() => {
+    // Rank topics by what has been analyzed recently; keep the defaults if nothing has been yet
+    const fetchTrending = async () => {
+      try {
+        const response = await axios.get('http://localhost:5000/api/trending?dimension=subreddit&window=24h&limit=10');
+        const rows = response.data && response.data.trending;
+        if (rows && rows.length > 0) {
+          setTrendingTopics(rows.map((row, idx) => ({ id: idx + 1, name: row.key, count: row.count })));
+        }
+      } catch (err) {
+        console.error("Error fetching trending topics:", err);
+      }
+    };
+    fetchTrending();
+  }, []);
+
   useEffect(() => {
     // Load trending topic content when component mounts or topic changes
     if (selectedTopic) {
@@ -154,6 +170,7 @@ function TrendingPage() {
                 onClick={() => setSelectedTopic(topic)}
               >
                 <span>r/{topic.name}</span>
+                {topic.count ? <span className="topic-count">{formatCount(topic.count)}</span> : null}
               </div>
             ))}
           </div>